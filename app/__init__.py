@@ -16,4 +16,8 @@ def create_app():
     app.register_blueprint(permits_bp)
     app.register_blueprint(api_bp)
 
+    from app import tracing, admission
+    tracing.init_app(app)
+    admission.init_app(app)
+
     return app
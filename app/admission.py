@@ -0,0 +1,97 @@
+"""
+Admission control for report submissions.
+
+Each worker process keeps a tally of the submission work it holds: request
+bodies being received and handled (counted by their Content-Length) and
+pictures waiting for or going through image processing (app/uploads.py).
+POST /api/reports is checked against that tally before its body is read.
+Past SUBMIT_MAX_UPLOAD_BYTES, SUBMIT_MAX_CONCURRENT submissions or
+SUBMIT_MAX_IMAGE_JOBS pictures it is rejected with 503 and Retry-After, body
+unread, so the worker stays free for map and search requests.
+
+Upload bytes are mostly held in temporary files, not memory: Werkzeug spools
+every file part over 500KB to disk while parsing, and app/ingest.py keeps at
+most SPOOL_MEMORY_BYTES of each picture in memory. The byte budget bounds
+that volume; memory is bounded by the image job limit and the per-picture
+limits of app/ingest.py.
+
+Only sizes and counts are looked at, never who is submitting.
+"""
+
+import threading
+from flask import g, jsonify, request
+from app.config import Config
+
+ENDPOINT = 'public.create_report'
+
+# Requests without a Content-Length are counted as this large
+UNKNOWN_LENGTH = 100 * 1024 * 1024
+
+_lock = threading.Lock()
+_state = {'submissions': 0, 'bytes': 0, 'image_jobs': 0, 'rejected': 0}
+
+
+def _admit(size):
+    """Count a submission of size bytes, or return False when over a limit"""
+    with _lock:
+        if (_state['submissions'] >= Config.SUBMIT_MAX_CONCURRENT
+                or _state['bytes'] + size > Config.SUBMIT_MAX_UPLOAD_BYTES
+                or _state['image_jobs'] >= Config.SUBMIT_MAX_IMAGE_JOBS):
+            _state['rejected'] += 1
+            return False
+        _state['submissions'] += 1
+        _state['bytes'] += size
+        return True
+
+
+def hold(size=0, image_jobs=0):
+    """Count upload bytes and pictures kept by this process past the request"""
+    with _lock:
+        _state['bytes'] += size
+        _state['image_jobs'] += image_jobs
+
+
+def release(size=0, image_jobs=0):
+    with _lock:
+        _state['bytes'] -= size
+        _state['image_jobs'] -= image_jobs
+
+
+def snapshot():
+    """Current tally of this worker, for /admin/perf"""
+    with _lock:
+        return dict(_state)
+
+
+def _before_request():
+    if request.endpoint != ENDPOINT:
+        return None
+
+    size = request.content_length
+    if size is None:
+        size = UNKNOWN_LENGTH
+    if size > Config.SUBMIT_MAX_UPLOAD_BYTES:
+        return jsonify({'error': 'Request too large'}), 413
+
+    if not _admit(size):
+        print(f"[ADMISSION] Submission rejected: {snapshot()}")
+        response = jsonify({'error': 'Too many submissions right now. Please try again in a minute.'})
+        response.headers['Retry-After'] = str(Config.SUBMIT_RETRY_AFTER)
+        return response, 503
+
+    g.submission_bytes = size
+    return None
+
+
+def _teardown_request(exc):
+    size = g.pop('submission_bytes', None)
+    if size is not None:
+        with _lock:
+            _state['submissions'] -= 1
+            _state['bytes'] -= size
+
+
+def init_app(app):
+    """Check report submissions of app against the limits of this process"""
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
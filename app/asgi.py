@@ -0,0 +1,188 @@
+"""
+ASGI entry point: async serving of the read-heavy public endpoints.
+
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 2 --timeout 60 app.asgi:application
+
+GET requests to the routes in ASYNC_ROUTES are handled on the event loop
+with the async Supabase clients (app/db.py), so one worker keeps hundreds of
+them in flight while they wait on Supabase. Everything else (forms, uploads,
+admin and validator pages) goes to the unchanged Flask app, run by a2wsgi in
+a pool of WSGI_THREADS threads, so a slow upload no longer holds up map loads
+and searches.
+
+The async handlers return the same responses as their Flask routes and share
+their per-worker caches (reports list, statistics, signed URLs, permits
+index). Their Supabase calls are not traced on /admin/perf.
+"""
+
+import asyncio
+from collections import namedtuple
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from flask import render_template
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+from app import create_app
+from app.config import Config
+from app.db import async_clients
+from app.cache import reports_cache
+from app.helpers import format_report
+from app.stats import get_stats_async
+from app.signed_urls import picture_urls_async
+from app.search import search_permits, rebuild_index_in_background
+from app.routes.api import REPORTS_SELECT, format_public_reports
+from app.routes.permits import search_args, db_search_query
+from app.routes.public import PUBLIC_PICTURE_STATUSES
+
+flask_app = create_app()
+_wsgi = WSGIMiddleware(flask_app, workers=Config.WSGI_THREADS)
+
+JSON = 'application/json'
+HTML = 'text/html; charset=utf-8'
+
+AsyncRequest = namedtuple('AsyncRequest', ['path', 'args', 'cookie'])
+
+# One load at a time per worker: concurrent requests on a cold cache wait
+# for the first one instead of all querying Supabase
+_reports_lock = asyncio.Lock()
+_stats_lock = asyncio.Lock()
+
+
+def _json(data, status=200):
+    """Same body as flask.jsonify"""
+    return status, JSON, flask_app.json.response(data).get_data()
+
+
+async def reports(request):
+    body = reports_cache.get('all')
+    if body is None:
+        async with _reports_lock:
+            version = reports_cache.version()
+            body = reports_cache.get('all')
+            if body is None:
+                formatted_reports = reports_cache.get('list')
+                if formatted_reports is None:
+                    anon, _ = await async_clients()
+                    response = await anon.table('reports').select(REPORTS_SELECT).execute()
+                    formatted_reports = format_public_reports(response.data or [])
+                    reports_cache.set('list', formatted_reports, version)
+                body = _json(formatted_reports)[2]
+                reports_cache.set('all', body, version)
+    return 200, JSON, body
+
+
+async def statistics(request):
+    anon, _ = await async_clients()
+    async with _stats_lock:
+        return _json(await get_stats_async(anon))
+
+
+async def permits_search(request):
+    try:
+        try:
+            query, issuer, limit = search_args(request.args)
+        except ValueError as e:
+            return _json({'error': str(e)}, 400)
+
+        # SQLite lookup in a thread, off the event loop
+        permits = await asyncio.to_thread(search_permits, query, issuer, limit)
+
+        if permits is None:
+            rebuild_index_in_background()
+            anon, _ = await async_clients()
+            permits = (await db_search_query(anon, query, issuer, limit).execute()).data or []
+
+        return _json({'success': True, 'total': len(permits), 'permits': permits})
+    except Exception as e:
+        return _json({'error': str(e)}, 500)
+
+
+async def permits_metadata(request):
+    try:
+        anon, _ = await async_clients()
+        response = await anon.table('permits_metadata').select('*').execute()
+        return _json({'success': True, 'metadata': response.data or []})
+    except Exception as e:
+        return _json({'error': str(e)}, 500)
+
+
+async def report_detail(request, report_id):
+    anon, admin = await async_clients()
+    response = await anon.table('reports').select('*').eq('id', report_id).execute()
+
+    if not response.data:
+        return 404, HTML, b'Report not found'
+
+    report_data = response.data[0]
+    report = format_report(report_data)
+
+    # Comments and pictures are fetched concurrently
+    comments = anon.table('comments').select('*').eq('report_id', report_id).execute()
+    report['pictures'] = []
+    if report_data['status'] in PUBLIC_PICTURE_STATUSES:
+        pictures = admin.table('pictures').select('storage_path, variant, group_id') \
+            .eq('report_id', report_id).order('created_at').execute()
+        comments_response, pictures_response = await asyncio.gather(comments, pictures)
+        report['pictures'] = await picture_urls_async(pictures_response.data or [], admin)
+    else:
+        comments_response = await comments
+    report['comments'] = comments_response.data or []
+
+    # The request context gives the template url_for and the session (login menu)
+    headers = {'Cookie': request.cookie} if request.cookie else None
+    with flask_app.test_request_context(request.path, headers=headers):
+        html = render_template('report_detail.html', report=report)
+    return 200, HTML, html.encode('utf-8')
+
+
+# Flask endpoint -> async handler; paths are matched with the Flask URL map
+ASYNC_ROUTES = {
+    'api.reports': reports,
+    'api.statistics': statistics,
+    'permits.api_search': permits_search,
+    'permits.api_metadata': permits_metadata,
+    'public.report_detail': report_detail,
+}
+
+_urls = flask_app.url_map.bind('localhost')
+
+
+def _match(path):
+    """(handler, view args) when path is one of ASYNC_ROUTES, else (None, None)"""
+    try:
+        endpoint, values = _urls.match(path, method='GET')
+    except HTTPException:
+        # Not found, redirects (trailing slash) and the like are left to Flask
+        return None, None
+    return ASYNC_ROUTES.get(endpoint), values
+
+
+async def _send(send, status, content_type, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type.encode('latin-1')),
+                    (b'content-length', str(len(body)).encode('latin-1'))]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        handler, values = _match(scope['path'])
+        if handler:
+            headers = dict(scope['headers'])
+            request = AsyncRequest(
+                scope['path'],
+                MultiDict(parse_qsl(scope['query_string'].decode('utf-8', 'replace'), keep_blank_values=True)),
+                headers.get(b'cookie', b'').decode('latin-1')
+            )
+            try:
+                status, content_type, body = await handler(request, **values)
+            except Exception as e:
+                print(f"[ASGI] {scope['path']} failed: {e}")
+                status, content_type, body = 500, HTML, b'Internal Server Error'
+            await _send(send, status, content_type, body)
+            return
+
+    await _wsgi(scope, receive, send)
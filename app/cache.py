@@ -0,0 +1,96 @@
+"""
+In-process caches shared by the routes.
+
+Each gunicorn worker keeps its own copy of the cached data. A small version
+file on local disk is bumped whenever the underlying data changes, so every
+worker on the same container drops its copy on the next request.
+
+That version only sees changes made through this container. Writes from
+other containers, scheduled cleanups or the Supabase dashboard are not
+noticed, so every entry also expires max_age seconds after it was loaded:
+cached data is at most that old.
+"""
+
+import os
+import threading
+import time
+from app.config import Config
+
+
+class VersionedCache:
+    """Key/value cache dropped whenever its shared version changes; entries expire after max_age seconds"""
+
+    def __init__(self, name, max_age=None):
+        self.name = name
+        self.max_age = Config.CACHE_MAX_AGE if max_age is None else max_age
+        self._path = os.path.join(Config.CACHE_DIR, f'{name}.version')
+        self._lock = threading.Lock()
+        self._data = {}
+        self._version = None
+
+    def version(self):
+        """Current shared version (changes on every invalidate)"""
+        try:
+            st = os.stat(self._path)
+            return (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def get(self, key):
+        """Return cached value for key, or None on a miss"""
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._data = {}
+                self._version = version
+                return None
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if time.monotonic() >= expires:
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, version):
+        """
+        Store value under key. version is what version() returned before the
+        value was loaded; if it has changed since, the value may predate an
+        invalidation and is dropped.
+        """
+        expires = time.monotonic() + self.max_age
+        current = self.version()
+        if version != current:
+            return
+        with self._lock:
+            if current != self._version:
+                self._data = {}
+                self._version = current
+            self._data[key] = (value, expires)
+
+    def _bump(self):
+        os.makedirs(Config.CACHE_DIR, exist_ok=True)
+        tmp_path = f'{self._path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self._path)
+
+    def invalidate(self):
+        """Bump the shared version so all workers drop their copy"""
+        self._bump()
+        with self._lock:
+            self._data = {}
+            self._version = None
+
+
+# Formatted public reports list (GET /api/reports)
+reports_cache = VersionedCache('reports')
+
+
+def invalidate_reports():
+    """Call after any change to reports or pictures"""
+    try:
+        reports_cache.invalidate()
+    except OSError as e:
+        print(f"[CACHE] Failed to invalidate reports cache: {e}")
@@ -0,0 +1,92 @@
+"""
+Server-side clustering of reports for the map.
+
+ReportMapIndex keeps the public reports sorted by latitude, so a viewport
+(bbox) query only walks the reports inside its latitude band. When a
+viewport holds more than MAX_MARKERS reports, they are aggregated on a grid
+whose cell size follows the zoom level (about CELL_PX pixels on screen),
+with counts by status and type per cell.
+"""
+
+import bisect
+import math
+
+# Above this many reports in view, clusters are returned instead of markers
+MAX_MARKERS = 300
+
+# From this zoom level on, reports are always returned individually
+MAX_CLUSTER_ZOOM = 17
+
+# Zoom levels of the map tiles; others are clamped to this range
+MIN_ZOOM, MAX_ZOOM = 0, 22
+
+# Approximate on-screen size of a cluster cell (256 px tiles)
+CELL_PX = 64
+
+
+class ReportMapIndex:
+    """Reports sorted by latitude for bbox queries and grid clustering"""
+
+    def __init__(self, reports):
+        self.reports = sorted(reports, key=lambda r: r['location']['lat'])
+        self.lats = [r['location']['lat'] for r in self.reports]
+
+    def in_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        start = bisect.bisect_left(self.lats, min_lat)
+        end = bisect.bisect_right(self.lats, max_lat)
+        return [
+            r for r in self.reports[start:end]
+            if min_lng <= r['location']['lng'] <= max_lng
+        ]
+
+    def query(self, min_lat, min_lng, max_lat, max_lng, zoom):
+        """Reports in the viewport, or clusters when there are too many"""
+        visible = self.in_bbox(min_lat, min_lng, max_lat, max_lng)
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+
+        if len(visible) <= MAX_MARKERS or zoom >= MAX_CLUSTER_ZOOM:
+            return {
+                'mode': 'reports',
+                'total': len(visible),
+                'reports': [_marker(r) for r in visible]
+            }
+
+        cell_deg = 360.0 / (2 ** zoom) * (CELL_PX / 256.0)
+        cells = {}
+        for r in visible:
+            lat, lng = r['location']['lat'], r['location']['lng']
+            key = (math.floor(lat / cell_deg), math.floor(lng / cell_deg))
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = {'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0, 'by_status': {}, 'by_type': {}}
+            cell['count'] += 1
+            cell['lat_sum'] += lat
+            cell['lng_sum'] += lng
+            cell['by_status'][r['status']] = cell['by_status'].get(r['status'], 0) + 1
+            cell['by_type'][r['type']] = cell['by_type'].get(r['type'], 0) + 1
+
+        clusters = []
+        for cell in cells.values():
+            clusters.append({
+                'lat': cell['lat_sum'] / cell['count'],
+                'lng': cell['lng_sum'] / cell['count'],
+                'count': cell['count'],
+                'by_status': cell['by_status'],
+                'by_type': cell['by_type']
+            })
+
+        return {
+            'mode': 'clusters',
+            'total': len(visible),
+            'clusters': clusters
+        }
+
+
+def _marker(report):
+    """Fields the map popup needs"""
+    return {
+        'id': report['id'],
+        'type': report['type'],
+        'status': report['status'],
+        'location': report['location']
+    }
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,3 +14,34 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+
+    # Local directory for per-container caches shared by gunicorn workers
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'raportare-cache'))
+
+    # Longest time (seconds) cached reports and statistics are served. Changes
+    # not made through this container are only seen once entries expire.
+    CACHE_MAX_AGE = int(os.getenv('CACHE_MAX_AGE', 60))
+    # Same for the permit caches, costly to rebuild and changed only by refreshes
+    PERMITS_CACHE_MAX_AGE = int(os.getenv('PERMITS_CACHE_MAX_AGE', 3600))
+
+    # Report pictures are stripped and uploaded by a background thread pool
+    ASYNC_PICTURE_UPLOADS = os.getenv('ASYNC_PICTURE_UPLOADS', 'True').lower() == 'true'
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 4))
+    UPLOAD_QUEUE_MAX = int(os.getenv('UPLOAD_QUEUE_MAX', 40))
+
+    # Per-request Supabase call tracing (/admin/perf) and Server-Timing headers
+    DB_TRACING = os.getenv('DB_TRACING', 'True').lower() == 'true'
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'False').lower() == 'true'
+
+    # Threads running the Flask routes when served through app/asgi.py
+    WSGI_THREADS = int(os.getenv('WSGI_THREADS', 8))
+
+    # A permits refresh that would remove more than this share of stored permits is refused
+    PERMITS_MAX_REMOVED_SHARE = float(os.getenv('PERMITS_MAX_REMOVED_SHARE', 0.25))
+
+    # Admission control for report submissions, per worker process (app/admission.py)
+    SUBMIT_MAX_CONCURRENT = int(os.getenv('SUBMIT_MAX_CONCURRENT', 4))
+    # Upload bytes held in memory or temp files by submissions and queued pictures
+    SUBMIT_MAX_UPLOAD_BYTES = int(os.getenv('SUBMIT_MAX_UPLOAD_BYTES', 200 * 1024 * 1024))
+    SUBMIT_MAX_IMAGE_JOBS = int(os.getenv('SUBMIT_MAX_IMAGE_JOBS', UPLOAD_QUEUE_MAX))
+    SUBMIT_RETRY_AFTER = int(os.getenv('SUBMIT_RETRY_AFTER', 30))
@@ -1,5 +1,7 @@
-from supabase import create_client, Client
+import asyncio
+from supabase import create_client, acreate_client, Client, AsyncClient
 from app.config import Config
+from app.tracing import instrument_client
 
 # Public client (respects RLS)
 supabase: Client = create_client(
@@ -12,3 +14,25 @@ supabase_admin: Client = create_client(
     Config.SUPABASE_URL,
     Config.SUPABASE_SERVICE_KEY
 )
+
+# Time every PostgREST/Storage call per request (see app/tracing.py)
+if Config.DB_TRACING:
+    instrument_client(supabase, 'supabase')
+    instrument_client(supabase_admin, 'supabase_admin')
+
+# Async clients of the ASGI read paths (app/asgi.py), one pair per worker:
+# each keeps its own pooled HTTP connections shared by all requests
+_async_clients = None
+_async_lock = asyncio.Lock()
+
+
+async def async_clients():
+    """(anon, service) AsyncClients, created on first use"""
+    global _async_clients
+    if _async_clients is None:
+        async with _async_lock:
+            if _async_clients is None:
+                anon: AsyncClient = await acreate_client(Config.SUPABASE_URL, Config.SUPABASE_ANON_KEY)
+                admin: AsyncClient = await acreate_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
+                _async_clients = (anon, admin)
+    return _async_clients
@@ -0,0 +1,176 @@
+"""
+Cross-source deduplication of permits.
+
+The same authorisation is often published both by PS1 (XLS files) and PMB
+(table API). After each refresh every permit gets blocking keys: hashes of
+its normalized permit number with the issue date, and with its main street
+word. Only PS1/PMB pairs sharing a key are compared; a pair is the same
+permit when the numbers agree, the issue years don't conflict (numbering
+restarts every year) and the dates or the streets agree. Connected pairs
+form a cluster.
+
+Each cluster has one canonical permit (the PMB record when there is one,
+since it has coordinates); the others point at it through
+`permits.canonical_id`. Canonical permits keep canonical_id NULL, so search
+and matching only need the rows where it is NULL.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from app.db import supabase_admin
+from app.search import fold_text, permit_number, fetch_all_permits
+from app.matching import parse_address, street_similarity
+
+BATCH_SIZE = 1000
+
+# Streets at least this similar confirm a number match without an equal date
+MIN_STREET_SIMILARITY = 0.5
+
+_NUMBER_RE = re.compile(r'\d+')
+_ISO_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+_RO_DATE_RE = re.compile(r'(\d{1,2})[./](\d{1,2})[./](\d{4})')
+
+
+def normalize_number(value):
+    """Leading digits without zeros: "AC 0123/12.05.2024" -> "123" """
+    match = _NUMBER_RE.search(str(value or ''))
+    if not match:
+        return None
+    return match.group(0).lstrip('0') or '0'
+
+
+def normalize_date(value):
+    """YYYY-MM-DD from "2024-05-12", "12.05.2024" or "12/05/2024" """
+    value = str(value or '')
+    match = _ISO_DATE_RE.search(value)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _RO_DATE_RE.search(value)
+        if not match:
+            return None
+        day, month, year = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"
+
+
+def _issue_date(data):
+    """Issue date from the data blob (own column, or embedded in the number)"""
+    for key, value in (data or {}).items():
+        key_folded = fold_text(key)
+        if key_folded == 'date' or key_folded.startswith('data'):
+            date = normalize_date(value)
+            if date:
+                return date
+    return normalize_date(permit_number(data))
+
+
+def _hash(*parts):
+    return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _record(permit):
+    data = permit.get('data') or {}
+    number = normalize_number(permit_number(data))
+    date = _issue_date(data)
+    street = parse_address(permit.get('address')).street
+    return {
+        'id': permit['id'],
+        'issuer': permit['issuer'],
+        'number': number,
+        'date': date,
+        'street': street,
+        'canonical_id': permit.get('canonical_id')
+    }
+
+
+def blocking_keys(record):
+    """Hashed keys; records of the two sources sharing one are compared"""
+    if not record['number']:
+        return []
+    keys = []
+    if record['date']:
+        keys.append(_hash('nd', record['number'], record['date']))
+    if record['street']:
+        # Longest word: the most distinctive part of the street name
+        keys.append(_hash('ns', record['number'], max(record['street'], key=len)))
+    return keys
+
+
+def _same_permit(a, b):
+    if a['number'] != b['number']:
+        return False
+    if a['date'] and b['date']:
+        if a['date'] == b['date']:
+            return True
+        if a['date'][:4] != b['date'][:4]:
+            return False
+    return street_similarity(a['street'], b['street']) >= MIN_STREET_SIMILARITY
+
+
+def find_clusters(records):
+    """Union-find over cross-source pairs that share a blocking key"""
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    blocks = defaultdict(list)
+    for record in records:
+        for key in blocking_keys(record):
+            blocks[key].append(record)
+
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        ps1 = [r for r in block if r['issuer'] == 'ps1']
+        pmb = [r for r in block if r['issuer'] == 'pmb']
+        for a in ps1:
+            for b in pmb:
+                if _same_permit(a, b):
+                    parent.setdefault(a['id'], a['id'])
+                    parent.setdefault(b['id'], b['id'])
+                    root_a, root_b = find(a['id']), find(b['id'])
+                    if root_a != root_b:
+                        parent[root_a] = root_b
+
+    clusters = defaultdict(list)
+    by_id = {r['id']: r for r in records}
+    for record_id in parent:
+        clusters[find(record_id)].append(by_id[record_id])
+    return list(clusters.values())
+
+
+def _canonical(cluster):
+    """PMB record first (it has coordinates), then the lowest id for stability"""
+    return min(cluster, key=lambda r: (r['issuer'] != 'pmb', r['id']))['id']
+
+
+def dedupe_permits():
+    """Recompute permit clusters and store canonical ids. Returns the number of duplicates."""
+    records = [
+        _record(permit)
+        for permit in fetch_all_permits('id, issuer, address, data, canonical_id')
+    ]
+
+    wanted = {}
+    for cluster in find_clusters(records):
+        canonical_id = _canonical(cluster)
+        for record in cluster:
+            if record['id'] != canonical_id:
+                wanted[record['id']] = canonical_id
+
+    # Only rows whose canonical id changed are written
+    links = [
+        {'id': r['id'], 'canonical_id': wanted.get(r['id'])}
+        for r in records
+        if wanted.get(r['id']) != r['canonical_id']
+    ]
+    for start in range(0, len(links), BATCH_SIZE):
+        supabase_admin.rpc('set_permit_canonical', {'links': links[start:start + BATCH_SIZE]}).execute()
+
+    print(f"[DEDUP] {len(wanted)} duplicate permits, {len(links)} links updated")
+    return len(wanted)
@@ -0,0 +1,266 @@
+"""
+Strip EXIF/XMP/IPTC metadata from uploaded photos without decoding pixels.
+
+The container is rewritten segment by segment (JPEG markers, PNG chunks,
+WebP RIFF chunks) and every block that can carry personal data (GPS, camera
+serials, timestamps, embedded thumbnails, comments) is dropped. Image data is
+copied byte for byte, so there is no re-compression.
+
+The only metadata kept is the EXIF orientation, re-written as a minimal EXIF
+block holding that single tag, so photos taken in portrait still display
+upright.
+
+strip_metadata() raises ValueError for anything it can't rewrite safely;
+callers fall back to a full decode/re-encode.
+"""
+
+import struct
+import zlib
+
+JPEG_SOI = b'\xff\xd8'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXIF_HEADER = b'Exif\x00\x00'
+ORIENTATION_TAG = 0x0112
+
+# JPEG markers without a length field
+_JPEG_STANDALONE = {0x01} | set(range(0xD0, 0xD8))
+
+# PNG ancillary chunks that only describe how to render pixels
+_PNG_SAFE_ANCILLARY = {
+    b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT', b'pHYs', b'bKGD',
+    b'hIST', b'acTL', b'fcTL', b'fdAT', b'cICP',
+}
+
+# WebP chunks that carry image data or rendering info
+_WEBP_SAFE_CHUNKS = {b'VP8 ', b'VP8L', b'VP8X', b'ALPH', b'ANIM', b'ANMF', b'ICCP'}
+
+_WEBP_FLAG_XMP = 0x04
+_WEBP_FLAG_EXIF = 0x08
+
+
+def detect_format(data):
+    """Return 'jpeg', 'png', 'webp' or None based on magic bytes"""
+    if data[:2] == JPEG_SOI:
+        return 'jpeg'
+    if data[:8] == PNG_SIGNATURE:
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def strip_metadata(data):
+    """Return image bytes with all metadata removed except orientation"""
+    fmt = detect_format(data)
+    if fmt == 'jpeg':
+        return _strip_jpeg(data)
+    if fmt == 'png':
+        return _strip_png(data)
+    if fmt == 'webp':
+        return _strip_webp(data)
+    raise ValueError('Unsupported image format')
+
+
+def read_orientation(tiff):
+    """Read the Orientation tag from raw TIFF/EXIF data (1 if missing)"""
+    if tiff.startswith(EXIF_HEADER):
+        tiff = tiff[len(EXIF_HEADER):]
+    if len(tiff) < 8:
+        return 1
+
+    if tiff[:2] == b'MM':
+        endian = '>'
+    elif tiff[:2] == b'II':
+        endian = '<'
+    else:
+        return 1
+
+    ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+
+    count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(count):
+        entry = ifd_offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag, field_type = struct.unpack(endian + 'HH', tiff[entry:entry + 4])
+        if tag == ORIENTATION_TAG and field_type == 3:
+            value = struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def orientation_tiff(orientation):
+    """Build a minimal TIFF block holding only the Orientation tag"""
+    return (
+        b'MM\x00\x2a\x00\x00\x00\x08'
+        + struct.pack('>H', 1)
+        + struct.pack('>HHIHH', ORIENTATION_TAG, 3, 1, orientation, 0)
+        + struct.pack('>I', 0)
+    )
+
+
+def _jpeg_segment(marker, payload):
+    return b'\xff' + bytes([marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def _strip_jpeg(data):
+    """Drop APPn (except JFIF, ICC, Adobe) and COM segments"""
+    out = [JPEG_SOI]
+    orientation = 1
+    orientation_written = False
+    pos = 2
+    size = len(data)
+
+    while pos < size:
+        if data[pos] != 0xFF:
+            raise ValueError('Corrupt JPEG marker')
+        # Skip fill bytes
+        while pos < size and data[pos] == 0xFF:
+            pos += 1
+        if pos >= size:
+            raise ValueError('Truncated JPEG')
+        marker = data[pos]
+        pos += 1
+
+        if marker == 0xD9:  # EOI - anything after it (MPF images, vendor trailers) is dropped
+            out.append(b'\xff\xd9')
+            return b''.join(out)
+
+        if marker in _JPEG_STANDALONE:
+            out.append(b'\xff' + bytes([marker]))
+            continue
+
+        if pos + 2 > size:
+            raise ValueError('Truncated JPEG')
+        length = struct.unpack('>H', data[pos:pos + 2])[0]
+        if length < 2 or pos + length > size:
+            raise ValueError('Corrupt JPEG segment length')
+        payload = data[pos + 2:pos + length]
+        segment_end = pos + length
+
+        keep = True
+        if marker == 0xE1:  # APP1: EXIF or XMP
+            if payload.startswith(EXIF_HEADER):
+                orientation = read_orientation(payload)
+            keep = False
+        elif marker == 0xE2:  # APP2: keep ICC profile only (drop FlashPix/MPF)
+            keep = payload.startswith(b'ICC_PROFILE\x00')
+        elif 0xE3 <= marker <= 0xEF:
+            keep = marker == 0xEE  # APP14 Adobe (colour transform)
+        elif marker == 0xFE:  # COM
+            keep = False
+
+        if marker not in (0xE0, 0xE1) and not orientation_written and orientation != 1:
+            # Orientation goes right after JFIF / before the first non-APP0 segment
+            out.append(_jpeg_segment(0xE1, EXIF_HEADER + orientation_tiff(orientation)))
+            orientation_written = True
+
+        if keep:
+            out.append(data[pos - 2:segment_end])
+        pos = segment_end
+
+        if marker == 0xDA:  # SOS - copy entropy-coded data up to the next real marker
+            scan_end = pos
+            while True:
+                scan_end = data.find(b'\xff', scan_end)
+                if scan_end == -1 or scan_end + 1 >= size:
+                    raise ValueError('Truncated JPEG scan')
+                next_byte = data[scan_end + 1]
+                if next_byte == 0x00 or 0xD0 <= next_byte <= 0xD7 or next_byte == 0xFF:
+                    scan_end += 1
+                    continue
+                break
+            out.append(data[pos:scan_end])
+            pos = scan_end
+
+    raise ValueError('JPEG without EOI')
+
+
+def _png_chunk(chunk_type, payload):
+    return (
+        struct.pack('>I', len(payload)) + chunk_type + payload
+        + struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xFFFFFFFF)
+    )
+
+
+def _strip_png(data):
+    """Drop text, time and EXIF chunks, keep critical and rendering chunks"""
+    out = [PNG_SIGNATURE]
+    chunks = []
+    orientation = 1
+    pos = len(PNG_SIGNATURE)
+    size = len(data)
+
+    while pos + 8 <= size:
+        length = struct.unpack('>I', data[pos:pos + 4])[0]
+        chunk_type = data[pos + 4:pos + 8]
+        chunk_end = pos + 12 + length
+        if chunk_end > size:
+            raise ValueError('Truncated PNG chunk')
+
+        if chunk_type == b'eXIf':
+            orientation = read_orientation(data[pos + 8:pos + 8 + length])
+        elif chunk_type[0:1].isupper() or chunk_type in _PNG_SAFE_ANCILLARY:
+            chunks.append((chunk_type, data[pos:chunk_end]))
+
+        pos = chunk_end
+        if chunk_type == b'IEND':
+            break
+    else:
+        raise ValueError('PNG without IEND')
+
+    for chunk_type, raw in chunks:
+        # eXIf must come before the first IDAT
+        if orientation != 1 and chunk_type in (b'IDAT', b'acTL', b'fcTL'):
+            out.append(_png_chunk(b'eXIf', orientation_tiff(orientation)))
+            orientation = 1
+        out.append(raw)
+
+    return b''.join(out)
+
+
+def _strip_webp(data):
+    """Rebuild a WebP from its image chunks, dropping EXIF, XMP and unknown chunks"""
+    size = len(data)
+    pos = 12
+    chunks = []
+    orientation = 1
+    vp8x_index = None
+
+    while pos + 8 <= size:
+        fourcc = data[pos:pos + 4]
+        length = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        chunk_end = pos + 8 + length + (length & 1)
+        if pos + 8 + length > size:
+            raise ValueError('Truncated WebP chunk')
+
+        if fourcc == b'EXIF':
+            orientation = read_orientation(data[pos + 8:pos + 8 + length])
+        elif fourcc in _WEBP_SAFE_CHUNKS:
+            if fourcc == b'VP8X':
+                vp8x_index = len(chunks)
+            chunks.append([fourcc, data[pos:min(chunk_end, size)]])
+        pos = chunk_end
+
+    if vp8x_index is None:
+        # Simple WebP: metadata chunks appended to it are ignored by
+        # decoders (orientation included), so only the image is kept
+        orientation = 1
+    else:
+        vp8x = bytearray(chunks[vp8x_index][1])
+        if len(vp8x) < 18:
+            raise ValueError('Truncated VP8X chunk')
+        vp8x[8] &= ~(_WEBP_FLAG_XMP | _WEBP_FLAG_EXIF) & 0xFF
+        if orientation != 1:
+            vp8x[8] |= _WEBP_FLAG_EXIF
+        chunks[vp8x_index][1] = bytes(vp8x)
+
+    body = [b'WEBP'] + [raw for _, raw in chunks]
+    if orientation != 1:
+        tiff = orientation_tiff(orientation)
+        body.append(b'EXIF' + struct.pack('<I', len(tiff)) + tiff)
+
+    payload = b''.join(body)
+    return b'RIFF' + struct.pack('<I', len(payload)) + payload
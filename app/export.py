@@ -0,0 +1,112 @@
+"""
+Streaming bulk exports of reports and permits (NDJSON and CSV).
+
+Rows are read from Supabase one keyset page at a time (ordered by id, each
+page starting after the last id of the previous one) and every page is
+serialized and yielded as one chunk, so memory stays flat whatever the size
+of the table and the first bytes go out after the first page.
+"""
+
+import csv
+import io
+import json
+from app.db import supabase_admin
+
+PAGE_SIZE = 1000
+
+REPORT_COLUMNS = [
+    'id', 'type', 'status', 'location_lat', 'location_lng', 'address', 'description',
+    'submitted_by_username', 'pictures_status', 'created_at', 'updated_at',
+    'picture_paths', 'comment_count'
+]
+
+PERMIT_COLUMNS = [
+    'id', 'issuer', 'natural_key', 'canonical_id', 'address', 'lat', 'lng', 'source_url', 'data',
+    'created_at', 'updated_at'
+]
+
+
+def _iter_pages(table, select, page_size=PAGE_SIZE):
+    """Yield lists of rows, keyset-paged on id"""
+    last_id = None
+    while True:
+        query = supabase_admin.table(table).select(select)
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(page_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            break
+        last_id = rows[-1]['id']
+
+
+def _report_pages():
+    select = ', '.join(REPORT_COLUMNS[:-2]) + ', pictures(storage_path, variant), comments(count)'
+    for rows in _iter_pages('reports', select):
+        for row in rows:
+            pictures = row.pop('pictures', None) or []
+            comments = row.pop('comments', None) or []
+            row['picture_paths'] = [
+                p['storage_path'] for p in pictures
+                if p.get('variant', 'original') == 'original'
+            ]
+            row['comment_count'] = comments[0]['count'] if comments else 0
+        yield rows
+
+
+def _permit_pages():
+    yield from _iter_pages('permits', ', '.join(PERMIT_COLUMNS))
+
+
+DATASETS = {
+    'reports': (_report_pages, REPORT_COLUMNS),
+    'permits': (_permit_pages, PERMIT_COLUMNS),
+}
+
+
+def _ndjson(pages, columns):
+    for rows in pages:
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ' '.join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _csv(pages, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # The header goes out before the first page is fetched
+    yield buffer.getvalue()
+    for rows in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in rows:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+
+
+FORMATS = {
+    'ndjson': (_ndjson, 'application/x-ndjson'),
+    'csv': (_csv, 'text/csv'),
+}
+
+
+def export_stream(dataset, fmt):
+    """Generator of text chunks for dataset ('reports'/'permits') in fmt ('ndjson'/'csv')"""
+    pages, columns = DATASETS[dataset]
+    serialize = FORMATS[fmt][0]
+    try:
+        yield from serialize(pages(), columns)
+    except Exception as e:
+        # Headers are already sent; the client sees a truncated file
+        print(f"[EXPORT] {dataset}.{fmt} export failed: {e}")
+        raise
@@ -0,0 +1,170 @@
+"""
+Coordinate conversion and spatial lookup for permits.
+
+PMB publishes permit locations in Stereo70 (EPSG:3844), while reports use
+WGS84 lat/lng. stereo70_to_wgs84() converts whole coordinate arrays at once
+with NumPy: inverse oblique stereographic projection on the Krasovsky 1940
+ellipsoid (EPSG method 9809), then a 7-parameter Helmert shift to WGS84
+(the PROJ towgs84 parameters for EPSG:3844, accurate to a few metres).
+
+PermitGrid is a uniform grid over geolocated permits for radius queries.
+"""
+
+import math
+import numpy as np
+
+# Krasovsky 1940 ellipsoid
+KRASOVSKY_A = 6378245.0
+KRASOVSKY_F = 1 / 298.3
+
+# WGS84 ellipsoid
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# Stereo70 projection parameters
+STEREO70_LAT0 = math.radians(46.0)
+STEREO70_LON0 = math.radians(25.0)
+STEREO70_K0 = 0.99975
+STEREO70_FE = 500000.0
+STEREO70_FN = 500000.0
+
+# Dealul Piscului 1970 -> WGS84 (position vector convention)
+HELMERT = {
+    'tx': 2.329, 'ty': -147.042, 'tz': -92.08,
+    'rx': -0.309, 'ry': 0.325, 'rz': 0.497,  # arc-seconds
+    'ds': 5.69,  # ppm
+}
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _stereographic_constants(a, f, lat0):
+    e2 = f * (2 - f)
+    e = math.sqrt(e2)
+    sin0 = math.sin(lat0)
+    rho0 = a * (1 - e2) / (1 - e2 * sin0 ** 2) ** 1.5
+    nu0 = a / math.sqrt(1 - e2 * sin0 ** 2)
+    R = math.sqrt(rho0 * nu0)
+    n = math.sqrt(1 + (e2 * math.cos(lat0) ** 4) / (1 - e2))
+    s1 = (1 + sin0) / (1 - sin0)
+    s2 = (1 - e * sin0) / (1 + e * sin0)
+    w1 = (s1 * s2 ** e) ** n
+    sin_chi0 = (w1 - 1) / (w1 + 1)
+    c = (n + sin0) * (1 - sin_chi0) / ((n - sin0) * (1 + sin_chi0))
+    w2 = c * w1
+    chi0 = math.asin((w2 - 1) / (w2 + 1))
+    return e2, e, R, n, c, chi0
+
+
+def inverse_oblique_stereographic(easting, northing, a, f, lat0, lon0, k0, fe, fn):
+    """EPSG method 9809 inverse: projected arrays -> geodetic lat/lon in radians"""
+    e2, e, R, n, c, chi0 = _stereographic_constants(a, f, lat0)
+    dx = np.asarray(easting, dtype=float) - fe
+    dy = np.asarray(northing, dtype=float) - fn
+
+    g = 2 * R * k0 * math.tan(math.pi / 4 - chi0 / 2)
+    h = 4 * R * k0 * math.tan(chi0) + g
+    i = np.arctan(dx / (h + dy))
+    j = np.arctan(dx / (g - dy)) - i
+    chi = chi0 + 2 * np.arctan((dy - dx * np.tan(j / 2)) / (2 * R * k0))
+    big_lambda = j + 2 * i + lon0
+    lon = (big_lambda - lon0) / n + lon0
+
+    sin_chi = np.sin(chi)
+    psi = 0.5 * np.log((1 + sin_chi) / (c * (1 - sin_chi))) / n
+    lat = 2 * np.arctan(np.exp(psi)) - math.pi / 2
+
+    # Isometric latitude iteration, converges in a handful of steps
+    for _ in range(8):
+        sin_lat = np.sin(lat)
+        psi_i = np.log(np.tan(lat / 2 + math.pi / 4) * ((1 - e * sin_lat) / (1 + e * sin_lat)) ** (e / 2))
+        lat = lat - (psi_i - psi) * np.cos(lat) * (1 - e2 * sin_lat ** 2) / (1 - e2)
+
+    return lat, lon
+
+
+def _geodetic_to_geocentric(lat, lon, a, f):
+    e2 = f * (2 - f)
+    nu = a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+    x = nu * np.cos(lat) * np.cos(lon)
+    y = nu * np.cos(lat) * np.sin(lon)
+    z = (1 - e2) * nu * np.sin(lat)
+    return x, y, z
+
+
+def _geocentric_to_geodetic(x, y, z, a, f):
+    e2 = f * (2 - f)
+    lon = np.arctan2(y, x)
+    p = np.sqrt(x ** 2 + y ** 2)
+    lat = np.arctan2(z, p * (1 - e2))
+    for _ in range(5):
+        nu = a / np.sqrt(1 - e2 * np.sin(lat) ** 2)
+        lat = np.arctan2(z + e2 * nu * np.sin(lat), p)
+    return lat, lon
+
+
+def _helmert(x, y, z, tx, ty, tz, rx, ry, rz, ds):
+    """7-parameter position vector transformation"""
+    arcsec = math.pi / (180 * 3600)
+    rx, ry, rz = rx * arcsec, ry * arcsec, rz * arcsec
+    m = 1 + ds * 1e-6
+    return (
+        tx + m * (x - rz * y + ry * z),
+        ty + m * (rz * x + y - rx * z),
+        tz + m * (-ry * x + rx * y + z),
+    )
+
+
+def stereo70_to_wgs84(x, y):
+    """Convert Stereo70 easting/northing arrays to WGS84 (lat, lng) degree arrays"""
+    lat, lon = inverse_oblique_stereographic(
+        x, y, KRASOVSKY_A, KRASOVSKY_F,
+        STEREO70_LAT0, STEREO70_LON0, STEREO70_K0, STEREO70_FE, STEREO70_FN
+    )
+    gx, gy, gz = _geodetic_to_geocentric(lat, lon, KRASOVSKY_A, KRASOVSKY_F)
+    gx, gy, gz = _helmert(gx, gy, gz, **HELMERT)
+    lat, lon = _geocentric_to_geodetic(gx, gy, gz, WGS84_A, WGS84_F)
+    return np.degrees(lat), np.degrees(lon)
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    h = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+class PermitGrid:
+    """Uniform lat/lng grid of items for radius queries"""
+
+    def __init__(self, items, cell_m=250):
+        # items: iterable of dicts with 'lat' and 'lng'
+        self.cell_deg = cell_m / 111320.0
+        self.cells = {}
+        self.count = 0
+        for item in items:
+            self.cells.setdefault(self._cell(item['lat'], item['lng']), []).append(item)
+            self.count += 1
+
+    def _cell(self, lat, lng):
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg)))
+
+    def near(self, lat, lng, radius_m, limit=50):
+        """Items within radius_m of (lat, lng), nearest first, with 'distance_m'"""
+        lat_span = int(math.ceil(radius_m / 111320.0 / self.cell_deg))
+        lng_scale = max(math.cos(math.radians(lat)), 0.01)
+        lng_span = int(math.ceil(radius_m / (111320.0 * lng_scale) / self.cell_deg))
+        row, col = self._cell(lat, lng)
+
+        found = []
+        for r in range(row - lat_span, row + lat_span + 1):
+            for c in range(col - lng_span, col + lng_span + 1):
+                for item in self.cells.get((r, c), ()):
+                    d = distance_m(lat, lng, item['lat'], item['lng'])
+                    if d <= radius_m:
+                        found.append((d, item))
+
+        found.sort(key=lambda pair: pair[0])
+        return [dict(item, distance_m=round(d, 1)) for d, item in found[:limit]]
@@ -2,6 +2,7 @@ from functools import wraps
 from flask import session, redirect, url_for
 from PIL import Image
 import io
+from app.exif import strip_metadata
 
 
 def login_required(role=None):
@@ -26,6 +27,13 @@ def login_required(role=None):
 
 def strip_exif(image_data):
     """Remove EXIF data from image for privacy"""
+    # Fast path: rewrite the container without touching pixel data
+    try:
+        return strip_metadata(image_data)
+    except ValueError:
+        pass
+
+    # Fallback for formats the container rewriter can't handle
     image = Image.open(io.BytesIO(image_data))
 
     # Create new image without EXIF
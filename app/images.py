@@ -0,0 +1,65 @@
+"""
+Resized variants of report pictures.
+
+Every upload is stored as three WebP files under
+`<report_id>/<group_id>/<variant>.webp`:
+
+- thumb: for picture grids
+- medium: for full-width views on phones and the detail pages
+- original: the upload capped to ORIGINAL_MAX_PX, opened from the grids
+
+Re-encoding also drops all metadata; orientation is applied to the pixels
+first so photos keep the right way up.
+"""
+
+import io
+from PIL import Image, ImageOps
+
+# Variant name -> (longest side in pixels, WebP quality), largest first
+VARIANTS = {
+    'original': (2560, 85),
+    'medium': (1280, 80),
+    'thumb': (400, 75),
+}
+
+ORIGINAL_MAX_PX = VARIANTS['original'][0]
+
+CONTENT_TYPE = 'image/webp'
+
+
+def variant_path(report_id, group_id, variant):
+    return f"{report_id}/{group_id}/{variant}.webp"
+
+
+def _encode(image, quality):
+    output = io.BytesIO()
+    image.save(output, format='WEBP', quality=quality, method=4)
+    return output.getvalue()
+
+
+def make_variants(image_file):
+    """
+    Decode a picture (a file object) once and encode every variant.
+    Returns [(variant, bytes, width, height)], largest first.
+    Raises on data Pillow can't decode.
+    """
+    image = Image.open(image_file)
+    # JPEG can decode straight to a reduced scale, much cheaper than a full decode
+    image.draft('RGB', (ORIGINAL_MAX_PX, ORIGINAL_MAX_PX))
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    # Scaled down before rotating, so at most one full-size copy is held;
+    # the longest side is the same either way
+    image.thumbnail((ORIGINAL_MAX_PX, ORIGINAL_MAX_PX), Image.LANCZOS)
+    image = ImageOps.exif_transpose(image)
+
+    variants = []
+    for variant, (max_px, quality) in VARIANTS.items():
+        # Each variant is resized from the previous (already smaller) one
+        if max(image.size) > max_px:
+            image = image.copy()
+            image.thumbnail((max_px, max_px), Image.LANCZOS)
+        variants.append((variant, _encode(image, quality), image.width, image.height))
+    return variants
@@ -0,0 +1,192 @@
+"""
+Bounded ingestion of uploaded report pictures.
+
+Each uploaded file is copied in chunks into a SpooledTemporaryFile (kept in
+memory up to SPOOL_MEMORY_BYTES, written to disk beyond that), stopping as
+soon as it is over MAX_FILE_BYTES. The format comes from the file's magic
+bytes, never from the client's content_type or filename. The pixel
+dimensions are read from the image header, so pictures that would decode to
+more than MAX_DECODE_PIXELS are turned away before Pillow decodes anything.
+
+The pixel limit applies to what make_variants() actually decodes: JPEGs are
+decoded at a reduced scale (Pillow draft mode), PNG and WebP at full size.
+Together with the file size limit this bounds the memory of a submission
+whatever its pictures contain.
+"""
+
+import struct
+import tempfile
+from collections import namedtuple
+from app.exif import detect_format
+from app.images import ORIGINAL_MAX_PX
+
+MAX_PICTURES = 10
+MAX_FILE_BYTES = 10 * 1024 * 1024  # 10MB
+
+# About 96MB decoded as RGBA; 12MP phone photos decode at full size, 48MP
+# ones at half scale
+MAX_DECODE_PIXELS = 24_000_000
+
+# Uploads larger than this are spooled to disk
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+CHUNK_SIZE = 64 * 1024
+
+# Format (from magic bytes) -> (file extension, content type)
+FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg'),
+    'png': ('png', 'image/png'),
+    'webp': ('webp', 'image/webp'),
+}
+
+# JPEG start-of-frame markers (the ones holding the image size)
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# JPEG markers without a length field
+_JPEG_STANDALONE = {0x01} | set(range(0xD0, 0xD8))
+
+Picture = namedtuple('Picture', ['file', 'size', 'format', 'width', 'height'])
+
+
+def _jpeg_size(stream):
+    stream.seek(2)
+    while True:
+        if stream.read(1) != b'\xff':
+            return None
+        marker = stream.read(1)
+        while marker == b'\xff':  # fill bytes
+            marker = stream.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in _JPEG_STANDALONE:
+            continue
+        length = struct.unpack('>H', stream.read(2))[0]
+        if length < 2:
+            return None
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack('>xHH', stream.read(5))
+            return width, height
+        stream.seek(length - 2, 1)
+
+
+def _png_size(stream):
+    stream.seek(12)
+    if stream.read(4) != b'IHDR':
+        return None
+    return struct.unpack('>II', stream.read(8))
+
+
+# Bytes of each WebP image chunk's payload needed to read the size
+_WEBP_HEADER_LENGTHS = {b'VP8X': 10, b'VP8 ': 10, b'VP8L': 5}
+
+
+def _webp_size(stream):
+    stream.seek(12)
+    chunk = stream.read(4)
+    needed = _WEBP_HEADER_LENGTHS.get(chunk)
+    if needed is None:
+        return None
+    header = stream.read(4 + needed)
+    if len(header) < 4 + needed or struct.unpack('<I', header[:4])[0] < needed:
+        return None
+
+    if chunk == b'VP8X':
+        # Canvas size, 24-bit little-endian, minus one
+        width = int.from_bytes(header[8:11], 'little') + 1
+        height = int.from_bytes(header[11:14], 'little') + 1
+        return width, height
+    if chunk == b'VP8 ':
+        if header[7:10] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', header[10:14])
+        return width & 0x3FFF, height & 0x3FFF
+    # VP8L
+    if header[4:5] != b'\x2f':
+        return None
+    bits = int.from_bytes(header[5:9], 'little')
+    return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+
+
+_SIZE_READERS = {'jpeg': _jpeg_size, 'png': _png_size, 'webp': _webp_size}
+
+
+def read_size(stream, fmt):
+    """(width, height) from the image header, or None if it can't be read"""
+    try:
+        size = _SIZE_READERS[fmt](stream)
+    except (struct.error, IndexError):
+        size = None
+    finally:
+        stream.seek(0)
+    # A zero height (JPEG DNL) or width is not worth supporting
+    return size if size and all(size) else None
+
+
+def decoded_pixels(fmt, width, height):
+    """Pixels make_variants() decodes for a picture of this format and size"""
+    if fmt == 'jpeg':
+        # Same scale as PIL.JpegImagePlugin.draft() picks
+        scale = min(width // ORIGINAL_MAX_PX, height // ORIGINAL_MAX_PX)
+        for factor in (8, 4, 2, 1):
+            if scale >= factor:
+                break
+        return -(-width // factor) * -(-height // factor)
+    return width * height
+
+
+def _spool(file):
+    """Copy an upload into a spooled temporary file; None if over MAX_FILE_BYTES"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+    while True:
+        chunk = file.stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_FILE_BYTES:
+            spooled.close()
+            return None, size
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled, size
+
+
+def _ingest(file):
+    spooled, size = _spool(file)
+    if spooled is None:
+        raise ValueError(f'File too large: {file.filename}. Max 10MB.')
+
+    fmt = detect_format(spooled.read(12))
+    spooled.seek(0)
+    dimensions = read_size(spooled, fmt) if fmt else None
+    if not dimensions:
+        spooled.close()
+        raise ValueError(f'Invalid file type: {file.filename}. Only JPEG, PNG, WebP allowed.')
+
+    width, height = dimensions
+    if decoded_pixels(fmt, width, height) > MAX_DECODE_PIXELS:
+        spooled.close()
+        raise ValueError(f'Picture too large: {file.filename} ({width}x{height} pixels).')
+
+    return Picture(spooled, size, fmt, width, height)
+
+
+def ingest_pictures(files):
+    """
+    Validate and spool uploaded files, return [Picture].
+    Raises ValueError with a message for the submitter when a file is rejected.
+    """
+    files = [file for file in files if file and file.filename]
+    if len(files) > MAX_PICTURES:
+        raise ValueError(f'Maximum {MAX_PICTURES} pictures allowed')
+
+    pictures = []
+    try:
+        for file in files:
+            pictures.append(_ingest(file))
+    except ValueError:
+        for picture in pictures:
+            picture.file.close()
+        raise
+    return pictures
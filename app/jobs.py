@@ -0,0 +1,201 @@
+"""
+Background jobs for permit refreshes.
+
+The admin POST only claims the issuer and queues a job; a worker thread in
+the same process runs the scrape, the database sync and the search index
+rebuild. Progress (phase, pages/files done, rows written, elapsed time) is
+written to the `permit_jobs` table, which the admin permits page polls.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from app.db import supabase_admin
+from app.permits_sync import sync_permits
+from app.search import rebuild_index, invalidate_permits_geo
+from app.matching import match_all_reports
+from app.dedup import dedupe_permits
+from app.uploads import recover_stuck_pictures
+
+# A 'running' issuer whose metadata hasn't moved for this long is considered
+# abandoned (e.g. the worker process was restarted mid-job)
+STALE_AFTER = timedelta(minutes=30)
+
+# Minimum seconds between two progress writes
+PROGRESS_INTERVAL = 1.0
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class _JobProgress:
+    """Writes job progress to permit_jobs, throttled to one write per interval"""
+
+    def __init__(self, job_id, issuer):
+        self.job_id = job_id
+        self.issuer = issuer
+        self.started = time.monotonic()
+        self.last_write = 0.0
+
+    def update(self, force=False, **fields):
+        now = time.monotonic()
+        if not force and now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        fields['elapsed_seconds'] = round(now - self.started, 1)
+        fields['updated_at'] = 'now()'
+        try:
+            supabase_admin.table('permit_jobs').update(fields).eq('id', self.job_id).execute()
+            # Keeps the issuer claim fresh so it isn't taken as stale
+            supabase_admin.table('permits_metadata').update({'updated_at': 'now()'}).eq('issuer', self.issuer).execute()
+        except Exception as e:
+            print(f"[JOBS] Progress update for job {self.job_id} failed: {e}")
+
+
+def _claim_issuer(issuer, username):
+    """Atomically mark the issuer as running; False if a job already holds it"""
+    cutoff = (datetime.now(timezone.utc) - STALE_AFTER).strftime('%Y-%m-%dT%H:%M:%SZ')
+    response = supabase_admin.table('permits_metadata').update({
+        'status': 'running',
+        'error_message': None,
+        'scraped_by_username': username,
+        'updated_at': 'now()'
+    }).eq('issuer', issuer).or_(f'status.neq.running,updated_at.lt.{cutoff}').execute()
+    return bool(response.data)
+
+
+def start_refresh(issuer, username):
+    """Queue a refresh for issuer. Returns the job row, or None if one is running."""
+    if not _claim_issuer(issuer, username):
+        return None
+
+    try:
+        job = supabase_admin.table('permit_jobs').insert({
+            'issuer': issuer,
+            'status': 'queued',
+            'phase': 'queued',
+            'started_by_username': username
+        }).execute().data[0]
+
+        supabase_admin.table('permits_metadata').update({
+            'current_job_id': job['id']
+        }).eq('issuer', issuer).execute()
+    except Exception:
+        supabase_admin.table('permits_metadata').update({'status': 'idle'}).eq('issuer', issuer).execute()
+        raise
+
+    _queue.put((job['id'], issuer))
+    _ensure_worker()
+    return job
+
+
+def get_job(job_id):
+    response = supabase_admin.table('permit_jobs').select('*').eq('id', job_id).execute()
+    return response.data[0] if response.data else None
+
+
+def _run_refresh(job_id, issuer):
+    """Scrape, sync and re-index one issuer, reporting progress as it goes"""
+    tag = f"[{issuer.upper()}]"
+    job = _JobProgress(job_id, issuer)
+
+    try:
+        job.update(force=True, status='running', phase='scraping')
+
+        if issuer == 'ps1':
+            from app.scrapers.ps1 import scrape_permits
+        else:
+            from app.scrapers.pmb import scrape_permits
+
+        permits_data = scrape_permits(
+            progress=lambda done, total: job.update(items_done=done, items_total=total)
+        )
+
+        job.update(force=True, phase='writing', permits_scraped=len(permits_data))
+        counts = sync_permits(
+            issuer,
+            permits_data,
+            progress=lambda rows: job.update(rows_written=rows)
+        )
+        rows_written = counts['added'] + counts['changed'] + counts['removed']
+
+        supabase_admin.table('permits_metadata').update({
+            'total_count': counts['total'],
+            'last_added_count': counts['added'],
+            'last_changed_count': counts['changed'],
+            'last_removed_count': counts['removed'],
+            'last_scraped_at': 'now()',
+            'status': 'idle',
+            'error_message': None,
+            'updated_at': 'now()'
+        }).eq('issuer', issuer).execute()
+        invalidate_permits_geo()
+
+        # Link PS1/PMB records of the same permit before indexing and matching
+        job.update(force=True, phase='deduplicating', rows_written=rows_written)
+        try:
+            dedupe_permits()
+        except Exception as e:
+            print(f"{tag} Permit deduplication failed: {e}")
+
+        # Refresh the local search index
+        job.update(force=True, phase='indexing', rows_written=rows_written)
+        try:
+            rebuild_index()
+        except Exception as e:
+            print(f"{tag} Search index rebuild failed: {e}")
+
+        # Re-match no-paperwork reports against the new permits
+        job.update(force=True, phase='matching')
+        try:
+            match_all_reports()
+        except Exception as e:
+            print(f"{tag} Report matching failed: {e}")
+
+        # Housekeeping: reports whose picture batch died with a worker
+        try:
+            recover_stuck_pictures()
+        except Exception as e:
+            print(f"{tag} Recovering stuck pictures failed: {e}")
+
+        job.update(
+            force=True,
+            status='done',
+            phase='done',
+            rows_written=rows_written,
+            finished_at='now()',
+            message=(
+                f"Successfully refreshed {counts['total']} permits from {issuer.upper()} "
+                f"({counts['added']} added, {counts['changed']} changed, {counts['removed']} removed)"
+            )
+        )
+
+    except Exception as e:
+        print(f"{tag} Refresh job {job_id} failed: {e}")
+        supabase_admin.table('permits_metadata').update({
+            'status': 'error',
+            'error_message': str(e)
+        }).eq('issuer', issuer).execute()
+        job.update(force=True, status='error', phase='error', finished_at='now()', error_message=str(e))
+
+
+def _work():
+    while True:
+        job_id, issuer = _queue.get()
+        try:
+            _run_refresh(job_id, issuer)
+        except Exception as e:
+            print(f"[JOBS] Job {job_id} crashed: {e}")
+        finally:
+            _queue.task_done()
+
+
+def _ensure_worker():
+    """Start the worker thread on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='permit-jobs', daemon=True)
+            _worker.start()
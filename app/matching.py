@@ -0,0 +1,300 @@
+"""
+Matching of no-paperwork reports against permits.
+
+Addresses are folded the same way as for search (see app/search.py) and
+split into street words and house numbers; "10-12" style ranges expand to
+every number on that side of the street. Permits are indexed in blocks keyed
+by street word, and a report is only compared with the permits sharing one
+of its street words (plus, when it has a location, the geolocated permits
+nearby), never with the whole table.
+
+Each candidate gets a score from 0 to 1 combining street similarity, house
+number agreement and distance, averaged over the parts both sides have. The
+top MAX_MATCHES above MIN_SCORE are stored in `report_permit_matches`.
+
+New reports are matched in the background when they are created
+(`reports.matched_at` marks the ones done); every report is re-matched after
+each permit refresh.
+"""
+
+import re
+import threading
+from collections import defaultdict, namedtuple
+from app.config import Config
+from app.db import supabase_admin
+from app.cache import VersionedCache
+from app.geo import PermitGrid, distance_m
+from app.search import fold_text, ABBREVIATIONS, STREET_TYPES, STOP_WORDS, fetch_all_permits
+
+MAX_MATCHES = 5
+MIN_SCORE = 0.5
+
+# Geolocated permits within this distance are candidates even without a
+# street match; the distance score drops to zero at this radius
+NEAR_RADIUS_M = 300
+
+# Street words shared by more permits than this don't narrow anything down
+# ("mihai", "ion") and are skipped for blocking when rarer words exist
+MAX_BLOCK_SIZE = 2000
+
+# Largest "10-40" range that is expanded into single numbers
+MAX_RANGE_SPAN = 40
+
+WEIGHTS = {'street': 0.55, 'number': 0.25, 'distance': 0.20}
+
+BATCH_SIZE = 200
+
+# Words that end the street name (what follows is not part of it)
+_PLACE_WORDS = {'sector', 'bucuresti', 'romania', 'bloc', 'bl', 'scara', 'etaj', 'et', 'apartament', 'corp', 'lot'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+_NUMBER_RE = re.compile(r'^(\d+)([a-z]?)$')
+_RANGE_RE = re.compile(r'^(\d+)[a-z]?-(\d+)[a-z]?$')
+
+ParsedAddress = namedtuple('ParsedAddress', ['street', 'numbers'])
+
+_cache = VersionedCache('permit_matcher', max_age=Config.PERMITS_CACHE_MAX_AGE)
+_build_lock = threading.Lock()
+_run_lock = threading.Lock()
+_pending = threading.Event()
+
+
+def _expand_range(start, end):
+    start, end = int(start), int(end)
+    if end < start or end - start > MAX_RANGE_SPAN:
+        return {str(start), str(end)}
+    # Same parity: one side of the street (10-16 is 10, 12, 14, 16)
+    step = 2 if (end - start) % 2 == 0 else 1
+    return {str(n) for n in range(start, end + 1, step)}
+
+
+def parse_address(address):
+    """Fold an address into street words and house numbers"""
+    street = []
+    numbers = set()
+    street_done = False
+    skip_number = False
+
+    for raw in _TOKEN_RE.findall(fold_text(address)):
+        raw = ABBREVIATIONS.get(raw, raw)
+        match = _RANGE_RE.match(raw)
+        if match and street and not skip_number:
+            numbers |= _expand_range(*match.groups())
+            continue
+
+        for token in raw.split('-'):
+            token = ABBREVIATIONS.get(token, token)
+            if not token or token in STOP_WORDS or token in STREET_TYPES:
+                continue
+            if skip_number:
+                skip_number = False
+                if _NUMBER_RE.match(token):
+                    continue
+            if token in _PLACE_WORDS:
+                # "sector 1", "bl 5", "ap 12": the number after it isn't a house number
+                skip_number = token not in ('bucuresti', 'romania')
+                street_done = bool(street)
+                continue
+            if street and _NUMBER_RE.match(token):
+                numbers.add(token)
+            elif not street_done and not numbers:
+                # Words before the house number (including "13 septembrie") form the street
+                street.append(token)
+
+    return ParsedAddress(frozenset(street), frozenset(numbers))
+
+
+def street_similarity(a, b):
+    """Mean of Jaccard and containment: "campineanu" vs "ion campineanu" is 0.75"""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return (common / len(a | b) + common / min(len(a), len(b))) / 2
+
+
+def number_similarity(a, b):
+    """1 for a shared number, 0.5 for the same base number (20 vs 20a), else 0"""
+    if a & b:
+        return 1.0
+    base_a = {_NUMBER_RE.match(n).group(1) for n in a}
+    base_b = {_NUMBER_RE.match(n).group(1) for n in b}
+    return 0.5 if base_a & base_b else 0.0
+
+
+class PermitMatcher:
+    """Street-blocked index of permits for scoring report candidates"""
+
+    def __init__(self, permits):
+        self.permits = []
+        self.blocks = defaultdict(list)
+        geolocated = []
+
+        for permit in permits:
+            index = len(self.permits)
+            parsed = parse_address(permit.get('address'))
+            lat = float(permit['lat']) if permit.get('lat') is not None else None
+            lng = float(permit['lng']) if permit.get('lng') is not None else None
+            self.permits.append((permit['id'], parsed, lat, lng))
+            for token in parsed.street:
+                self.blocks[token].append(index)
+            if lat is not None:
+                geolocated.append({'index': index, 'lat': lat, 'lng': lng})
+
+        self.grid = PermitGrid(geolocated, cell_m=NEAR_RADIUS_M)
+
+    def _candidates(self, parsed, lat, lng):
+        blocks = [self.blocks[t] for t in parsed.street if t in self.blocks]
+        selective = [b for b in blocks if len(b) <= MAX_BLOCK_SIZE]
+        if not selective and blocks:
+            selective = [min(blocks, key=len)]
+
+        candidates = {}
+        for block in selective:
+            for index in block:
+                candidates[index] = None
+        if lat is not None:
+            for item in self.grid.near(lat, lng, NEAR_RADIUS_M, limit=MAX_BLOCK_SIZE):
+                candidates[item['index']] = item['distance_m']
+        return candidates
+
+    def match(self, address, lat=None, lng=None, limit=MAX_MATCHES):
+        """Best permits for a report: [{'permit_id', 'score', 'distance_m'}]"""
+        parsed = parse_address(address)
+        scored = []
+
+        for index, distance in self._candidates(parsed, lat, lng).items():
+            permit_id, permit, permit_lat, permit_lng = self.permits[index]
+            parts = {}
+
+            if parsed.street and permit.street:
+                parts['street'] = street_similarity(parsed.street, permit.street)
+                if parsed.numbers and permit.numbers:
+                    parts['number'] = number_similarity(parsed.numbers, permit.numbers)
+                else:
+                    parts['number'] = 0.5  # unknown on one side
+
+            if distance is None and lat is not None and permit_lat is not None:
+                distance = distance_m(lat, lng, permit_lat, permit_lng)
+            if distance is not None:
+                parts['distance'] = max(0.0, 1 - distance / NEAR_RADIUS_M)
+
+            if not parts:
+                continue
+            total_weight = sum(WEIGHTS[name] for name in parts)
+            score = sum(WEIGHTS[name] * value for name, value in parts.items()) / total_weight
+            if score >= MIN_SCORE:
+                scored.append((score, permit_id, distance))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [
+            {
+                'permit_id': permit_id,
+                'score': round(score, 3),
+                'distance_m': round(distance, 1) if distance is not None else None
+            }
+            for score, permit_id, distance in scored[:limit]
+        ]
+
+
+def _get_matcher():
+    matcher = _cache.get('matcher')
+    if matcher is None:
+        with _build_lock:
+            version = _cache.version()
+            matcher = _cache.get('matcher')
+            if matcher is None:
+                matcher = PermitMatcher(fetch_all_permits('id, address, lat, lng', canonical=True))
+                _cache.set('matcher', matcher, version)
+    return matcher
+
+
+def invalidate_permit_matcher():
+    """Call after permits change so the next run reloads them"""
+    try:
+        _cache.invalidate()
+    except OSError as e:
+        print(f"[MATCH] Failed to invalidate permit matcher: {e}")
+
+
+def _match_batch(matcher, reports):
+    """Match and store one batch of reports, replacing their previous matches"""
+    rows = []
+    for report in reports:
+        for match in matcher.match(report.get('address'), float(report['location_lat']), float(report['location_lng'])):
+            rows.append(dict(match, report_id=report['id']))
+
+    report_ids = [report['id'] for report in reports]
+    supabase_admin.table('report_permit_matches').delete().in_('report_id', report_ids).execute()
+    if rows:
+        # Upsert: a run in another worker process may have stored the same
+        # pairs since the delete
+        supabase_admin.table('report_permit_matches').upsert(rows, on_conflict='report_id,permit_id').execute()
+    supabase_admin.table('reports').update({'matched_at': 'now()'}).in_('id', report_ids).execute()
+    return len(rows)
+
+
+def match_new_reports():
+    """Match the no-paperwork reports that haven't been matched yet"""
+    matcher = _get_matcher()
+    total = 0
+    while True:
+        reports = supabase_admin.table('reports').select('id, address, location_lat, location_lng') \
+            .eq('type', 'no-paperwork').is_('matched_at', 'null').limit(BATCH_SIZE).execute().data or []
+        if not reports:
+            return total
+        _match_batch(matcher, reports)
+        total += len(reports)
+
+
+def match_all_reports(progress=None):
+    """Re-match every no-paperwork report (after a permit refresh)"""
+    # Never at the same time as match_new_reports() in this process
+    with _run_lock:
+        total = _match_all_reports(progress)
+    if _pending.is_set():
+        # Reports submitted meanwhile found the lock held and were left to us
+        match_new_reports_in_background()
+    return total
+
+
+def _match_all_reports(progress):
+    invalidate_permit_matcher()
+    matcher = _get_matcher()
+    last_id = None
+    total = 0
+    while True:
+        query = supabase_admin.table('reports').select('id, address, location_lat, location_lng').eq('type', 'no-paperwork')
+        if last_id:
+            query = query.gt('id', last_id)
+        reports = query.order('id').limit(BATCH_SIZE).execute().data or []
+        if reports:
+            _match_batch(matcher, reports)
+            total += len(reports)
+            last_id = reports[-1]['id']
+            if progress:
+                progress(total)
+        if len(reports) < BATCH_SIZE:
+            print(f"[MATCH] Matched {total} reports against {len(matcher.permits)} permits")
+            return total
+
+
+def match_new_reports_in_background():
+    """Match new reports off the request thread; never runs alongside another match run"""
+    _pending.set()
+    if _run_lock.locked():
+        return
+
+    def run():
+        # _pending is checked again after the lock is released: a caller that
+        # set it while this run was finishing saw the lock held and left
+        while _pending.is_set() and _run_lock.acquire(blocking=False):
+            try:
+                while _pending.is_set():
+                    _pending.clear()
+                    match_new_reports()
+            except Exception as e:
+                print(f"[MATCH] Matching new reports failed: {e}")
+            finally:
+                _run_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,103 @@
+"""
+Keyset pagination for the admin and validator lists.
+
+Lists are ordered newest first on (created_at, id). A page is the next
+PAGE_SIZE rows strictly after the last row of the previous page, so every
+page costs one bounded, index-backed query no matter how deep it is
+(unlike offset paging). The position is passed around as an opaque cursor
+in the `after` query parameter.
+"""
+
+import base64
+import uuid
+from datetime import date, datetime, timedelta
+
+PAGE_SIZE = 50
+
+REPORT_STATUSES = ['pending', 'in-review', 'validated', 'rejected', 'resolved']
+REPORT_TYPES = ['no-paperwork', 'noise-violation', 'pollution-violation', 'others']
+
+# Columns the report queues render
+REPORT_LIST_COLUMNS = 'id, type, status, address, location_lat, location_lng, submitted_by_username, created_at'
+
+
+def encode_cursor(row):
+    """Cursor pointing just after row"""
+    raw = f"{row['created_at']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return created_at, row_id
+
+
+def parse_date(value):
+    """YYYY-MM-DD form value to a date, None if empty or invalid"""
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def filter_created_between(query, date_from=None, date_to=None):
+    """Limit to rows created on or after date_from and on or before date_to (inclusive days)"""
+    if date_from:
+        query = query.gte('created_at', date_from.isoformat())
+    if date_to:
+        query = query.lt('created_at', (date_to + timedelta(days=1)).isoformat())
+    return query
+
+
+def report_filters(args):
+    """Status, type and date range filters from the query string"""
+    status = args.get('status', '')
+    report_type = args.get('type', '')
+    return {
+        'status': status if status in REPORT_STATUSES else '',
+        'type': report_type if report_type in REPORT_TYPES else '',
+        'date_from': parse_date(args.get('date_from')),
+        'date_to': parse_date(args.get('date_to'))
+    }
+
+
+def apply_report_filters(query, filters):
+    if filters['status']:
+        query = query.eq('status', filters['status'])
+    if filters['type']:
+        query = query.eq('type', filters['type'])
+    return filter_created_between(query, filters['date_from'], filters['date_to'])
+
+
+def keyset_page(query, cursor=None, page_size=PAGE_SIZE):
+    """
+    Fetch one page of a filtered select, newest first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    The select must include created_at and id.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        created_at, row_id = position
+        # Quoted because timestamps contain PostgREST separators (':', '.', '+')
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+
+    # One extra row tells us whether there is a next page
+    response = query.order('created_at', desc=True).order('id', desc=True).limit(page_size + 1).execute()
+    rows = response.data or []
+
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,163 @@
+"""
+Differential sync of scraped permits into the `permits` table.
+
+Every permit gets a stable natural key (PMB `ID`, PS1 file path + permit
+number, or file path + row when there is no number) and a hash of its
+content. A refresh compares the scrape with what is stored and only sends
+the difference: new and changed permits in bulk upserts, vanished permits in
+bulk deletes.
+
+A scrape that would shrink the stored permits by more than
+PERMITS_MAX_REMOVED_SHARE is refused before anything is written: a missing
+page or file upstream must not wipe the table.
+"""
+
+import hashlib
+import json
+from urllib.parse import urlsplit
+from app.config import Config
+from app.db import supabase_admin
+
+BATCH_SIZE = 500
+
+
+def _ps1_permit_number(data):
+    """Permit number column of a PS1 row (header names vary between files)"""
+    for header, value in data.items():
+        header_lower = header.lower()
+        if header_lower.startswith('nr') and 'crt' not in header_lower:
+            return value.strip()
+    return None
+
+
+def natural_key(issuer, permit):
+    """Stable identifier of a permit across scrapes"""
+    if issuer == 'pmb':
+        return f"pmb:{permit['data']['ID']}"
+
+    # Full path: files with the same name exist in different upload folders
+    source = permit['source']
+    path = urlsplit(source.get('url', '')).path
+    number = _ps1_permit_number(permit['data'])
+    if number:
+        return f"ps1:{path}#{number}"
+    return f"ps1:{path}#row{source.get('row')}"
+
+
+def content_hash(row):
+    """Hash of the stored fields, used to detect changed permits"""
+    payload = json.dumps(
+        [row['address'], row['data'], row['source_url'], row['lat'], row['lng']],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def build_rows(issuer, permits_data):
+    """Turn scraper output into permits rows keyed by natural key"""
+    rows = {}
+    for permit in permits_data:
+        row = {
+            'issuer': issuer,
+            'address': permit['address'],
+            'lat': permit.get('lat'),
+            'lng': permit.get('lng'),
+            'data': permit['data'],
+            'source_url': permit['source'].get('url', '')
+        }
+
+        key = natural_key(issuer, permit)
+        # The same number can appear twice in a file; keep both rows
+        suffix = 2
+        unique_key = key
+        while unique_key in rows:
+            unique_key = f"{key}~{suffix}"
+            suffix += 1
+
+        row['natural_key'] = unique_key
+        row['content_hash'] = content_hash(row)
+        rows[unique_key] = row
+    return rows
+
+
+def _fetch_stored(issuer, page_size=1000):
+    """Map natural_key -> (id, content_hash) for the issuer's stored permits"""
+    stored = {}
+    legacy_ids = []
+    start = 0
+    while True:
+        response = (
+            supabase_admin.table('permits')
+            .select('id, natural_key, content_hash')
+            .eq('issuer', issuer)
+            .order('id')
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        rows = response.data or []
+        for row in rows:
+            if row['natural_key']:
+                stored[row['natural_key']] = (row['id'], row['content_hash'])
+            else:
+                # Rows from before natural keys existed are replaced
+                legacy_ids.append(row['id'])
+        if len(rows) < page_size:
+            break
+        start += page_size
+    return stored, legacy_ids
+
+
+def sync_permits(issuer, permits_data, progress=None):
+    """
+    Apply a scrape to the permits table, sending only the delta.
+    Returns {'total', 'added', 'changed', 'removed'}.
+    progress(rows_written) is called after each batch.
+    """
+    tag = f"[{issuer.upper()}]"
+    rows = build_rows(issuer, permits_data)
+    stored, legacy_ids = _fetch_stored(issuer)
+
+    added = [row for key, row in rows.items() if key not in stored]
+    changed = [
+        row for key, row in rows.items()
+        if key in stored and stored[key][1] != row['content_hash']
+    ]
+    removed_ids = [row_id for key, (row_id, _) in stored.items() if key not in rows] + legacy_ids
+
+    print(f"{tag} Diff: {len(added)} added, {len(changed)} changed, {len(removed_ids)} removed")
+
+    # Re-keyed permits count as removed and added, so only the net loss is checked
+    net_removed = len(stored) - len(rows)
+    if stored and net_removed > Config.PERMITS_MAX_REMOVED_SHARE * len(stored):
+        raise Exception(
+            f"Refusing to sync: the scrape has {len(rows)} permits against {len(stored)} stored "
+            f"(over {Config.PERMITS_MAX_REMOVED_SHARE:.0%} fewer). "
+            f"Raise PERMITS_MAX_REMOVED_SHARE if this is expected."
+        )
+
+    rows_written = 0
+
+    # Deletes go first so a legacy row can't clash with its keyed replacement
+    for i in range(0, len(removed_ids), BATCH_SIZE):
+        batch = removed_ids[i:i + BATCH_SIZE]
+        supabase_admin.table('permits').delete().in_('id', batch).execute()
+        rows_written += len(batch)
+        if progress:
+            progress(rows_written)
+
+    upserts = added + changed
+    for i in range(0, len(upserts), BATCH_SIZE):
+        batch = [dict(row, updated_at='now()') for row in upserts[i:i + BATCH_SIZE]]
+        supabase_admin.table('permits').upsert(batch, on_conflict='issuer,natural_key').execute()
+        print(f"{tag}   Upserted batch {i // BATCH_SIZE + 1}/{(len(upserts) - 1) // BATCH_SIZE + 1}")
+        rows_written += len(batch)
+        if progress:
+            progress(rows_written)
+
+    return {
+        'total': len(rows),
+        'added': len(added),
+        'changed': len(changed),
+        'removed': len(removed_ids)
+    }
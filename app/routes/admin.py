@@ -1,7 +1,14 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, Response, render_template, jsonify, request, stream_with_context
 import bcrypt
 from app.db import supabase_admin
+from app.config import Config
 from app.helpers import login_required
+from app.cache import invalidate_reports
+from app.stats import invalidate_stats
+from app.pagination import keyset_page, report_filters, apply_report_filters, REPORT_LIST_COLUMNS
+from app.export import export_stream, DATASETS, FORMATS
+from app.matching import match_new_reports_in_background
+from app import tracing, admission
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -13,13 +20,49 @@ def dashboard():
     return render_template('admin/dashboard.html')
 
 
+@bp.route('/export/<dataset>.<fmt>')
+@login_required(role='admin')
+def export(dataset, fmt):
+    """Stream a full dataset export (reports/permits as ndjson/csv)"""
+    if dataset not in DATASETS or fmt not in FORMATS:
+        return jsonify({'error': 'Unknown export'}), 404
+
+    return Response(
+        stream_with_context(export_stream(dataset, fmt)),
+        mimetype=FORMATS[fmt][1],
+        headers={
+            'Content-Disposition': f'attachment; filename={dataset}.{fmt}',
+            'Cache-Control': 'no-store'
+        }
+    )
+
+
+@bp.route('/perf')
+@login_required(role='admin')
+def perf():
+    """Supabase calls per route, as seen by this worker"""
+    return render_template('admin/perf.html', perf=tracing.perf_snapshot(), enabled=Config.DB_TRACING,
+                           threshold=tracing.N_PLUS_ONE_THRESHOLD, admission=admission.snapshot())
+
+
+@bp.route('/perf/reset', methods=['POST'])
+@login_required(role='admin')
+def perf_reset():
+    """Clear this worker's tracing data"""
+    tracing.reset()
+    return jsonify({'success': True})
+
+
 @bp.route('/users')
 @login_required(role='admin')
 def users():
     """User management"""
-    response = supabase_admin.table('official_users').select('*').execute()
-    users = response.data or []
-    return render_template('admin/users.html', users=users)
+    role = request.args.get('role', '')
+    query = supabase_admin.table('official_users').select('id, username, role, created_at')
+    if role in ('validator', 'admin'):
+        query = query.eq('role', role)
+    users, next_cursor = keyset_page(query, request.args.get('after'))
+    return render_template('admin/users.html', users=users, role=role, next_cursor=next_cursor)
 
 
 @bp.route('/users/create', methods=['POST'])
@@ -64,9 +107,10 @@ def delete_user(user_id):
 @login_required(role='admin')
 def reports():
     """Admin reports management"""
-    response = supabase_admin.table('reports').select('*').order('created_at', desc=True).execute()
-    reports = response.data or []
-    return render_template('admin/reports.html', reports=reports)
+    filters = report_filters(request.args)
+    query = apply_report_filters(supabase_admin.table('reports').select(REPORT_LIST_COLUMNS), filters)
+    reports, next_cursor = keyset_page(query, request.args.get('after'))
+    return render_template('admin/reports.html', reports=reports, filters=filters, next_cursor=next_cursor)
 
 
 @bp.route('/report/<report_id>/delete', methods=['POST'])
@@ -75,17 +119,20 @@ def delete_report(report_id):
     """Delete report and associated pictures"""
     try:
         # Fetch pictures to delete from storage
-        pictures_response = supabase_admin.table('pictures').select('*').eq('report_id', report_id).execute()
+        pictures_response = supabase_admin.table('pictures').select('storage_path').eq('report_id', report_id).execute()
 
-        # Delete pictures from storage
-        for pic in (pictures_response.data or []):
+        # Delete pictures (all variants) from storage in one call
+        paths = [pic['storage_path'] for pic in (pictures_response.data or [])]
+        if paths:
             try:
-                supabase_admin.storage.from_('report-pictures').remove([pic['storage_path']])
+                supabase_admin.storage.from_('report-pictures').remove(paths)
             except:
                 pass  # Continue even if storage deletion fails
 
         # Delete report (cascade will delete pictures and comments from DB)
         supabase_admin.table('reports').delete().eq('id', report_id).execute()
+        invalidate_reports()
+        invalidate_stats()
 
         return jsonify({'success': True})
     except Exception as e:
@@ -105,6 +152,8 @@ def update_report(report_id):
             if data['type'] not in valid_types:
                 return jsonify({'error': 'Tip invalid'}), 400
             updates['type'] = data['type']
+            # Re-queued for permit matching (only no-paperwork reports are matched)
+            updates['matched_at'] = None
 
         if 'description' in data:
             updates['description'] = data['description']
@@ -113,6 +162,11 @@ def update_report(report_id):
             return jsonify({'error': 'Nicio modificare specificată'}), 400
 
         supabase_admin.table('reports').update(updates).eq('id', report_id).execute()
+        invalidate_reports()
+        if 'type' in updates:
+            invalidate_stats()
+            if updates['type'] == 'no-paperwork':
+                match_new_reports_in_background()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -121,16 +175,25 @@ def update_report(report_id):
 @bp.route('/report/<report_id>/picture/<path:storage_path>/delete', methods=['POST'])
 @login_required(role='admin')
 def delete_picture(report_id, storage_path):
-    """Delete a specific picture from a report"""
+    """Delete a specific picture (with all its variants) from a report"""
     try:
+        picture = supabase_admin.table('pictures').select('group_id').eq('report_id', report_id).eq('storage_path', storage_path).execute()
+        group_id = picture.data[0]['group_id'] if picture.data else None
+
+        paths = [storage_path]
+        if group_id:
+            variants = supabase_admin.table('pictures').select('storage_path').eq('group_id', group_id).execute()
+            paths = [pic['storage_path'] for pic in (variants.data or [])] or paths
+
         # Delete from storage
         try:
-            supabase_admin.storage.from_('report-pictures').remove([storage_path])
+            supabase_admin.storage.from_('report-pictures').remove(paths)
         except:
             pass  # Continue even if storage deletion fails
 
         # Delete from database
-        supabase_admin.table('pictures').delete().eq('report_id', report_id).eq('storage_path', storage_path).execute()
+        supabase_admin.table('pictures').delete().eq('report_id', report_id).in_('storage_path', paths).execute()
+        invalidate_reports()
 
         return jsonify({'success': True})
     except Exception as e:
@@ -141,9 +204,12 @@ def delete_picture(report_id, storage_path):
 @login_required(role='admin')
 def contact_messages():
     """Admin contact messages view"""
-    response = supabase_admin.table('contact_messages').select('*').order('created_at', desc=True).execute()
-    messages = response.data or []
-    return render_template('admin/contact_messages.html', messages=messages)
+    read = request.args.get('read', '')
+    query = supabase_admin.table('contact_messages').select('id, email, message, read, admin_notes, created_at')
+    if read in ('yes', 'no'):
+        query = query.eq('read', read == 'yes')
+    messages, next_cursor = keyset_page(query, request.args.get('after'))
+    return render_template('admin/contact_messages.html', messages=messages, read=read, next_cursor=next_cursor)
 
 
 @bp.route('/contact/<message_id>/read', methods=['POST'])
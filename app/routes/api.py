@@ -1,17 +1,22 @@
-from flask import Blueprint, jsonify, request
+import math
+from flask import Blueprint, Response, jsonify, request
 from app.db import supabase, supabase_admin
 from app.helpers import format_report
+from app.cache import reports_cache
+from app.clusters import ReportMapIndex
+from app.stats import get_stats
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
 
-@bp.route('/reports', methods=['GET'])
-def reports():
-    """API endpoint for reports data"""
-    response = supabase.table('reports').select('*').execute()
+# Pictures are embedded so the whole list costs a single round trip
+REPORTS_SELECT = '*, pictures(storage_path, variant)'
 
+
+def format_public_reports(rows):
+    """Format report rows for the public list, hiding pending reports' content"""
     formatted_reports = []
-    for r in (response.data or []):
+    for r in rows:
         report = format_report(r)
 
         # Hide user-generated content for pending reports
@@ -20,32 +25,65 @@ def reports():
             report['pictures'] = []
             report['location']['address'] = None
         else:
-            # Fetch pictures for non-pending reports
-            pictures_response = supabase.table('pictures').select('*').eq('report_id', r['id']).execute()
-            report['pictures'] = [p['storage_path'] for p in pictures_response.data] if pictures_response.data else []
+            report['pictures'] = [
+                p['storage_path'] for p in (r.get('pictures') or [])
+                if p.get('variant', 'original') == 'original'
+            ]
 
         formatted_reports.append(report)
+    return formatted_reports
 
-    return jsonify(formatted_reports)
 
+def _load_reports():
+    """Formatted public reports list, cached until reports change"""
+    version = reports_cache.version()
+    formatted_reports = reports_cache.get('list')
 
-@bp.route('/statistics')
-def statistics():
-    """API endpoint for statistics"""
-    response = supabase.table('reports').select('*').execute()
-    reports = response.data or []
+    if formatted_reports is None:
+        response = supabase.table('reports').select(REPORTS_SELECT).execute()
+        formatted_reports = format_public_reports(response.data or [])
+        reports_cache.set('list', formatted_reports, version)
+
+    return formatted_reports
+
+
+@bp.route('/reports', methods=['GET'])
+def reports():
+    """API endpoint for reports data"""
+    version = reports_cache.version()
+    body = reports_cache.get('all')
+
+    if body is None:
+        body = jsonify(_load_reports()).get_data()
+        reports_cache.set('all', body, version)
 
-    stats = {
-        'total': len(reports),
-        'by_status': {},
-        'by_type': {}
-    }
+    return Response(body, mimetype='application/json')
+
+
+@bp.route('/reports/map', methods=['GET'])
+def reports_map():
+    """Reports (or clusters of reports) inside a map viewport"""
+    try:
+        min_lng, min_lat, max_lng, max_lat = [float(v) for v in request.args.get('bbox', '').split(',')]
+        zoom = int(request.args.get('zoom', 13))
+    except ValueError:
+        return jsonify({'error': 'bbox must be minLng,minLat,maxLng,maxLat and zoom an integer'}), 400
+    if not all(math.isfinite(v) for v in (min_lng, min_lat, max_lng, max_lat)):
+        return jsonify({'error': 'bbox must be finite numbers'}), 400
 
-    for report in reports:
-        stats['by_status'][report['status']] = stats['by_status'].get(report['status'], 0) + 1
-        stats['by_type'][report['type']] = stats['by_type'].get(report['type'], 0) + 1
+    version = reports_cache.version()
+    index = reports_cache.get('map_index')
+    if index is None:
+        index = ReportMapIndex(_load_reports())
+        reports_cache.set('map_index', index, version)
 
-    return jsonify(stats)
+    return jsonify(index.query(min_lat, min_lng, max_lat, max_lng, zoom))
+
+
+@bp.route('/statistics')
+def statistics():
+    """API endpoint for statistics"""
+    return jsonify(get_stats())
 
 
 @bp.route('/contact', methods=['POST'])
@@ -1,6 +1,9 @@
+import math
 from flask import Blueprint, render_template, jsonify, request, session
 from app.db import supabase, supabase_admin
 from app.helpers import login_required
+from app.search import search_permits, rebuild_index_in_background, permits_near
+from app.jobs import start_refresh, get_job
 
 bp = Blueprint('permits', __name__)
 
@@ -11,33 +14,80 @@ def search():
     return render_template('permits/search.html')
 
 
+def search_args(args):
+    """(query, issuer or None, limit) of a search request; ValueError when invalid"""
+    query = args.get('q', '').strip()
+    issuer = args.get('issuer', 'all')  # all, ps1, pmb
+    limit = min(int(args.get('limit', 50)), 100)
+
+    if not query or len(query) < 3:
+        raise ValueError('Query must be at least 3 characters')
+
+    return query, issuer if issuer in ['ps1', 'pmb'] else None, limit
+
+
+def db_search_query(client, query, issuer, limit):
+    """Supabase fallback search while the local index is being built (sync or async client)"""
+    db_query = client.table('permits').select('*')
+
+    # Filter by issuer (otherwise one row per permit, without cross-source duplicates)
+    if issuer:
+        db_query = db_query.eq('issuer', issuer)
+    else:
+        db_query = db_query.is_('canonical_id', 'null')
+
+    # Search in address (use ilike for case-insensitive partial match)
+    db_query = db_query.ilike('address', f'%{query}%')
+
+    # Order and limit
+    return db_query.order('created_at', desc=True).limit(limit)
+
+
 @bp.route('/api/permits/search')
 def api_search():
     """API endpoint for searching permits"""
     try:
-        query = request.args.get('q', '').strip()
-        issuer = request.args.get('issuer', 'all')  # all, ps1, pmb
-        limit = min(int(request.args.get('limit', 50)), 100)
+        try:
+            query, issuer, limit = search_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if not query or len(query) < 3:
-            return jsonify({'error': 'Query must be at least 3 characters'}), 400
+        # Local full-text index (diacritic and abbreviation folded, ranked)
+        permits = search_permits(query, issuer, limit)
 
-        # Build query
-        db_query = supabase.table('permits').select('*')
+        if permits is None:
+            # Index not built yet on this container: build it and use Supabase meanwhile
+            rebuild_index_in_background()
+            permits = db_search_query(supabase, query, issuer, limit).execute().data or []
 
-        # Filter by issuer
-        if issuer in ['ps1', 'pmb']:
-            db_query = db_query.eq('issuer', issuer)
+        return jsonify({
+            'success': True,
+            'total': len(permits),
+            'permits': permits
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Search in address (use ilike for case-insensitive partial match)
-        db_query = db_query.ilike('address', f'%{query}%')
 
-        # Order and limit
-        db_query = db_query.order('created_at', desc=True).limit(limit)
+@bp.route('/api/permits/near')
+def api_near():
+    """API endpoint for permits near a point (WGS84)"""
+    try:
+        lat = float(request.args.get('lat', ''))
+        lng = float(request.args.get('lng', ''))
+        radius = float(request.args.get('radius', 200))
+        limit = min(int(request.args.get('limit', 50)), 100)
+    except ValueError:
+        return jsonify({'error': 'lat, lng and radius must be numbers'}), 400
 
-        response = db_query.execute()
-        permits = response.data or []
+    if not all(math.isfinite(v) for v in (lat, lng, radius)):
+        return jsonify({'error': 'lat, lng and radius must be finite numbers'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+        return jsonify({'error': 'Invalid coordinates or radius'}), 400
+    radius = min(radius, 2000)
 
+    try:
+        permits = permits_near(lat, lng, radius, limit)
         return jsonify({
             'success': True,
             'total': len(permits),
@@ -72,65 +122,28 @@ def admin():
 @bp.route('/admin/permits/refresh/<issuer>', methods=['POST'])
 @login_required(role='admin')
 def admin_refresh(issuer):
-    """Trigger refresh of permits data"""
+    """Queue a background refresh of permits data"""
     if issuer not in ['ps1', 'pmb']:
         return jsonify({'error': 'Invalid issuer'}), 400
 
     try:
-        # Update status to running
-        supabase_admin.table('permits_metadata').update({
-            'status': 'running',
-            'error_message': None,
-            'scraped_by_username': session.get('username')
-        }).eq('issuer', issuer).execute()
-
-        # Import and run the appropriate scraper
-        if issuer == 'ps1':
-            from app.scrapers.ps1 import scrape_permits
-        else:
-            from app.scrapers.pmb import scrape_permits
-
-        permits_data = scrape_permits()
-
-        # Delete old permits for this issuer
-        print(f"[{issuer.upper()}] Deleting old permits from database...")
-        supabase_admin.table('permits').delete().eq('issuer', issuer).execute()
-
-        # Insert new permits
-        permits_to_insert = []
-        for permit in permits_data:
-            permits_to_insert.append({
-                'issuer': issuer,
-                'address': permit['address'],
-                'data': permit['data'],
-                'source_url': permit['source'].get('url', '')
-            })
-
-        # Insert in batches of 500
-        print(f"[{issuer.upper()}] Inserting {len(permits_to_insert)} permits into database...")
-        batch_size = 500
-        for i in range(0, len(permits_to_insert), batch_size):
-            batch = permits_to_insert[i:i+batch_size]
-            supabase_admin.table('permits').insert(batch).execute()
-            print(f"[{issuer.upper()}]   Inserted batch {i//batch_size + 1}/{(len(permits_to_insert)-1)//batch_size + 1}")
-
-        # Update metadata
-        supabase_admin.table('permits_metadata').update({
-            'total_count': len(permits_to_insert),
-            'last_scraped_at': 'now()',
-            'status': 'idle',
-            'error_message': None,
-            'updated_at': 'now()'
-        }).eq('issuer', issuer).execute()
+        job = start_refresh(issuer, session.get('username'))
+        if job is None:
+            return jsonify({'error': f'A refresh for {issuer.upper()} is already running'}), 409
 
-        return jsonify({
-            'success': True,
-            'message': f'Successfully refreshed {len(permits_to_insert)} permits from {issuer.upper()}'
-        })
+        return jsonify({'success': True, 'job_id': job['id']}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+
+@bp.route('/admin/permits/jobs/<job_id>')
+@login_required(role='admin')
+def admin_job(job_id):
+    """Progress of a permits refresh job"""
+    try:
+        job = get_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify({'success': True, 'job': job})
     except Exception as e:
-        supabase_admin.table('permits_metadata').update({
-            'status': 'error',
-            'error_message': str(e)
-        }).eq('issuer', issuer).execute()
         return jsonify({'error': str(e)}), 500
@@ -1,10 +1,19 @@
 from flask import Blueprint, render_template, jsonify, request, session
-import uuid
 from app.db import supabase, supabase_admin
-from app.helpers import strip_exif, format_report
+from app.config import Config
+from app.helpers import format_report
+from app.uploads import submit_pictures, process_pictures, recover_stuck_pictures_soon
+from app.ingest import ingest_pictures
+from app.cache import invalidate_reports
+from app.stats import invalidate_stats
+from app.signed_urls import picture_urls
+from app.matching import match_new_reports_in_background
 
 bp = Blueprint('public', __name__)
 
+# Pictures are shown publicly once a validator has looked at the report
+PUBLIC_PICTURE_STATUSES = ['in-review', 'validated', 'resolved']
+
 
 @bp.route('/')
 def home():
@@ -33,29 +42,11 @@ def create_report():
         if not all([report_type, lat, lng]):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        # Handle picture uploads
-        files = request.files.getlist('pictures')
-
-        # Validate file count
-        if len(files) > 10:
-            return jsonify({'error': 'Maximum 10 pictures allowed'}), 400
-
-        # Validate files
-        ALLOWED_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
-        MAX_SIZE = 10 * 1024 * 1024  # 10MB
-
-        for file in files:
-            if file and file.filename:
-                if file.content_type not in ALLOWED_TYPES:
-                    return jsonify({'error': f'Invalid file type: {file.filename}. Only JPEG, PNG, WebP allowed.'}), 400
-
-                # Check file size by reading
-                file.seek(0, 2)  # Seek to end
-                size = file.tell()
-                file.seek(0)  # Reset to start
-
-                if size > MAX_SIZE:
-                    return jsonify({'error': f'File too large: {file.filename}. Max 10MB.'}), 400
+        # Spool and validate picture uploads (format, size, pixel dimensions)
+        try:
+            pictures = ingest_pictures(request.files.getlist('pictures'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
         # Insert report
         report_data = {
@@ -64,7 +55,8 @@ def create_report():
             'location_lng': float(lng),
             'address': address,
             'description': description,
-            'status': 'pending'
+            'status': 'pending',
+            'pictures_status': 'processing' if pictures else 'done'
         }
 
         # Track if submitted by official user (validator/admin)
@@ -74,30 +66,16 @@ def create_report():
 
         response = supabase.table('reports').insert(report_data).execute()
         report_id = response.data[0]['id']
+        invalidate_reports()
+        invalidate_stats()
+        if report_type == 'no-paperwork':
+            match_new_reports_in_background()
 
-        # Upload pictures
-        for file in files:
-            if file and file.filename:
-                # Read and strip EXIF
-                image_data = file.read()
-                clean_image_data = strip_exif(image_data)
-
-                # Generate unique filename
-                ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'jpg'
-                filename = f"{report_id}/{uuid.uuid4()}.{ext}"
-
-                # Upload to Supabase Storage
-                supabase.storage.from_('report-pictures').upload(
-                    filename,
-                    clean_image_data,
-                    {'content-type': file.content_type}
-                )
-
-                # Save picture record (use admin client to bypass RLS)
-                supabase_admin.table('pictures').insert({
-                    'report_id': report_id,
-                    'storage_path': filename
-                }).execute()
+        # Strip EXIF and upload pictures (in the background when possible)
+        if pictures:
+            if not (Config.ASYNC_PICTURE_UPLOADS and submit_pictures(report_id, pictures)):
+                process_pictures(report_id, pictures)
+            recover_stuck_pictures_soon()
 
         return jsonify({'success': True, 'report_id': report_id}), 201
 
@@ -128,11 +106,9 @@ def report_detail(report_id):
 
     # Fetch pictures with signed URLs (only for non-pending reports)
     report['pictures'] = []
-    if report_data['status'] in ['in-review', 'validated', 'resolved']:
-        pictures_response = supabase_admin.table('pictures').select('*').eq('report_id', report_id).execute()
-        for pic in (pictures_response.data or []):
-            url = supabase_admin.storage.from_('report-pictures').create_signed_url(pic['storage_path'], 3600)
-            report['pictures'].append({'url': url['signedURL'], 'path': pic['storage_path']})
+    if report_data['status'] in PUBLIC_PICTURE_STATUSES:
+        pictures_response = supabase_admin.table('pictures').select('storage_path, variant, group_id').eq('report_id', report_id).order('created_at').execute()
+        report['pictures'] = picture_urls(pictures_response.data or [])
 
     return render_template('report_detail.html', report=report)
 
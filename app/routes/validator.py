@@ -1,6 +1,11 @@
 from flask import Blueprint, render_template, jsonify, request, session
 from app.db import supabase_admin
 from app.helpers import login_required
+from app.cache import invalidate_reports
+from app.stats import get_stats, invalidate_stats
+from app.signed_urls import picture_urls
+from app.search import permit_number
+from app.pagination import keyset_page, report_filters, apply_report_filters, REPORT_STATUSES, REPORT_LIST_COLUMNS
 
 bp = Blueprint('validator', __name__, url_prefix='/validator')
 
@@ -9,19 +14,24 @@ bp = Blueprint('validator', __name__, url_prefix='/validator')
 @login_required(role='validator')
 def dashboard():
     """Validator dashboard"""
-    # Fetch all reports
-    response = supabase_admin.table('reports').select('*').order('created_at', desc=True).execute()
-    reports = response.data or []
+    filters = report_filters(request.args)
+    query = apply_report_filters(supabase_admin.table('reports').select(REPORT_LIST_COLUMNS), filters)
+    reports, next_cursor = keyset_page(query, request.args.get('after'))
 
-    # Calculate stats
+    # Stats come from the aggregated counter cache
+    by_status = get_stats()['by_status']
     stats = {
-        'pending': sum(1 for r in reports if r['status'] == 'pending'),
-        'in_review': sum(1 for r in reports if r['status'] == 'in-review'),
-        'validated': sum(1 for r in reports if r['status'] == 'validated'),
-        'rejected': sum(1 for r in reports if r['status'] == 'rejected')
+        'pending': by_status.get('pending', 0),
+        'in_review': by_status.get('in-review', 0),
+        'validated': by_status.get('validated', 0),
+        'rejected': by_status.get('rejected', 0)
     }
 
-    return render_template('validator/dashboard.html', reports=reports, stats=stats)
+    return render_template('validator/dashboard.html',
+                         reports=reports,
+                         stats=stats,
+                         filters=filters,
+                         next_cursor=next_cursor)
 
 
 @bp.route('/report/<report_id>')
@@ -36,21 +46,30 @@ def report_detail(report_id):
     report = response.data[0]
 
     # Fetch pictures
-    pictures_response = supabase_admin.table('pictures').select('*').eq('report_id', report_id).execute()
-    pictures = []
-    for pic in (pictures_response.data or []):
-        # Generate signed URL (valid for 1 hour) using admin client
-        url = supabase_admin.storage.from_('report-pictures').create_signed_url(pic['storage_path'], 3600)
-        pictures.append({'url': url['signedURL'], 'path': pic['storage_path']})
+    pictures_response = supabase_admin.table('pictures').select('storage_path, variant, group_id').eq('report_id', report_id).order('created_at').execute()
+    # Signed URLs come from one batched storage call, cached until shortly before expiry
+    pictures = picture_urls(pictures_response.data or [])
 
     # Fetch comments
     comments_response = supabase_admin.table('comments').select('*').eq('report_id', report_id).order('created_at', desc=False).execute()
     comments = comments_response.data or []
 
+    # Stored permit matches (no-paperwork reports only)
+    matches = []
+    if report['type'] == 'no-paperwork':
+        matches_response = supabase_admin.table('report_permit_matches') \
+            .select('score, distance_m, permits(id, issuer, address, source_url, data)') \
+            .eq('report_id', report_id).order('score', desc=True).execute()
+        for match in (matches_response.data or []):
+            if match.get('permits'):
+                match['permit_number'] = permit_number(match['permits'].get('data'))
+                matches.append(match)
+
     return render_template('validator/report_detail.html',
                          report=report,
                          pictures=pictures,
-                         comments=comments)
+                         comments=comments,
+                         matches=matches)
 
 
 @bp.route('/report/<report_id>/status', methods=['POST'])
@@ -59,10 +78,17 @@ def update_status(report_id):
     """Update report status"""
     try:
         status = request.form.get('status')
-        if status not in ['pending', 'in-review', 'validated', 'rejected', 'resolved']:
+        if status not in REPORT_STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
 
+        current = supabase_admin.table('reports').select('status').eq('id', report_id).execute()
+        if not current.data:
+            return jsonify({'error': 'Report not found'}), 404
+
         supabase_admin.table('reports').update({'status': status}).eq('id', report_id).execute()
+        invalidate_reports()
+        if current.data[0]['status'] != status:
+            invalidate_stats()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2,8 +2,14 @@
 Scrape Sector 1 building permits from PMB website (urbanism.pmb.ro)
 """
 
-import requests
+import math
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from app.geo import stereo70_to_wgs84
 
 MAP_URL = "https://urbanism.pmb.ro/xportalurb/map/getfeature"
 TABLE_URL = "https://urbanism.pmb.ro/xportalurb/EntityList/GetData"
@@ -20,6 +26,10 @@ HEADERS = {
     'Content-Type': 'application/json',
 }
 
+# Parallel table page requests, and minimum spacing between any two request starts
+MAX_CONCURRENCY = int(os.getenv('PMB_CONCURRENCY', 4))
+MIN_REQUEST_INTERVAL = float(os.getenv('PMB_MIN_REQUEST_INTERVAL', 0.25))
+
 BUCHAREST_BBOX = {
     'min_x': 573000,
     'max_x': 602000,
@@ -28,54 +38,99 @@ BUCHAREST_BBOX = {
 }
 
 
-def _fetch_table_data():
-    """Fetch all building permits from table API"""
-    print("[PMB] Fetching permits from table API...")
-    all_permits = []
-    skip = 0
-    page_size = 5000
+class _RateLimiter:
+    """Spaces request starts at least `interval` seconds apart across threads"""
 
-    while True:
-        page_num = (skip // page_size) + 1
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0.0
 
-        params = {
-            'take': page_size,
-            'skip': skip,
-            'page': page_num,
-            'pageSize': page_size,
-            'id': 5,
-            'filters': '{"fld_61":""}'
-        }
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_for = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
 
-        try:
-            response = requests.get(TABLE_URL, params=params, headers=HEADERS, timeout=30)
-            response.raise_for_status()
-            data = response.json()
 
-            permits = data.get('Data', [])
-            total = data.get('Total', 0)
+def _create_session():
+    """Keep-alive session with a connection pool sized for the fetch threads"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=MAX_CONCURRENCY + 1)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _fetch_table_page(session, limiter, skip, page_size):
+    """Fetch one page of the table API"""
+    page_num = (skip // page_size) + 1
+
+    params = {
+        'take': page_size,
+        'skip': skip,
+        'page': page_num,
+        'pageSize': page_size,
+        'id': 5,
+        'filters': '{"fld_61":""}'
+    }
 
-            print(f"[PMB]   Page {page_num}: got {len(permits)} permits (total available: {total})")
+    limiter.wait()
+    response = session.get(TABLE_URL, params=params, timeout=30)
+    response.raise_for_status()
+    data = response.json()
 
-            if not permits:
-                break
+    permits = data.get('Data', [])
+    total = data.get('Total', 0)
+    print(f"[PMB]   Page {page_num}: got {len(permits)} permits (total available: {total})")
+    return permits, total
 
-            all_permits.extend(permits)
 
-            if skip + page_size >= total:
-                break
+def _fetch_table_data(session, limiter, page_size=5000, progress=None):
+    """Fetch all building permits from table API"""
+    print("[PMB] Fetching permits from table API...")
 
-            skip += page_size
-            time.sleep(0.5)
+    # First page tells us how many pages there are. A failed page fails the
+    # whole scrape: a partial list would make the sync delete the missing permits
+    first_page, total = _fetch_table_page(session, limiter, 0, page_size)
+
+    if not first_page:
+        return []
+
+    pages = {0: first_page}
+    remaining_skips = list(range(page_size, total, page_size))
+    pages_total = len(remaining_skips) + 1
+    if progress:
+        progress(1, pages_total)
+
+    def fetch(skip):
+        # One retry per page, then give up on the scrape
+        for attempt in range(2):
+            try:
+                return _fetch_table_page(session, limiter, skip, page_size)[0]
+            except Exception as e:
+                if attempt:
+                    print(f"[PMB]   Page {skip // page_size + 1} failed: {e}")
+                    raise Exception(f"PMB table page {skip // page_size + 1} failed: {e}") from e
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        for skip, permits in zip(remaining_skips, executor.map(fetch, remaining_skips)):
+            pages[skip] = permits
+            if progress:
+                progress(len(pages), pages_total)
 
-        except Exception:
-            break
+    all_permits = []
+    for skip in sorted(pages):
+        all_permits.extend(pages[skip])
 
     print(f"[PMB] Table API: fetched {len(all_permits)} permits total")
     return all_permits
 
 
-def _fetch_map_data():
+def _fetch_map_data(session, limiter):
     """Fetch permit coordinates from map API"""
     print("[PMB] Fetching coordinates from map API...")
     bbox_str = f"{BUCHAREST_BBOX['min_x']},{BUCHAREST_BBOX['min_y']},{BUCHAREST_BBOX['max_x']},{BUCHAREST_BBOX['max_y']},EPSG:3844"
@@ -88,7 +143,8 @@ def _fetch_map_data():
     }
 
     try:
-        response = requests.get(MAP_URL, params=params, headers=HEADERS, timeout=60)
+        limiter.wait()
+        response = session.get(MAP_URL, params=params, timeout=60)
         response.raise_for_status()
         data = response.json()
 
@@ -109,6 +165,7 @@ def _fetch_map_data():
 def _filter_sector1(table_permits, map_data):
     """Filter for Sector 1 and merge with map data"""
     sector1_permits = []
+    stereo70_coords = []  # (permit index, x, y)
 
     for permit in table_permits:
         sector = str(permit.get('fld_57', '')).strip()
@@ -161,6 +218,7 @@ def _filter_sector1(table_permits, map_data):
                     if isinstance(coords, list) and len(coords) == 2:
                         data_dict["Coordinates X"] = str(coords[0])
                         data_dict["Coordinates Y"] = str(coords[1])
+                        stereo70_coords.append((len(sector1_permits), coords[0], coords[1]))
 
                 if map_props.get('nr_ac'):
                     data_dict["AC Number"] = str(map_props.get('nr_ac', ''))
@@ -173,6 +231,8 @@ def _filter_sector1(table_permits, map_data):
 
             permit_obj = {
                 "address": address,
+                "lat": None,
+                "lng": None,
                 "data": data_dict,
                 "source": {
                     "issuer": "pmb",
@@ -182,25 +242,46 @@ def _filter_sector1(table_permits, map_data):
 
             sector1_permits.append(permit_obj)
 
+    # Convert all Stereo70 coordinates to WGS84 in one vectorized pass
+    if stereo70_coords:
+        indexes, xs, ys = zip(*stereo70_coords)
+        try:
+            lats, lngs = stereo70_to_wgs84(np.array(xs, dtype=float), np.array(ys, dtype=float))
+            for idx, lat, lng in zip(indexes, lats.tolist(), lngs.tolist()):
+                if math.isfinite(lat) and math.isfinite(lng):
+                    sector1_permits[idx]["lat"] = round(lat, 7)
+                    sector1_permits[idx]["lng"] = round(lng, 7)
+        except (TypeError, ValueError):
+            print("[PMB] Could not convert coordinates to WGS84")
+
     # Sort by date (newest first)
     sector1_permits.sort(key=lambda x: x['data'].get('Date', ''), reverse=True)
 
     return sector1_permits
 
 
-def scrape_permits():
+def scrape_permits(progress=None):
     """
     Scrape Sector 1 building permits from PMB.
     Returns list of permit dictionaries.
+    progress(pages_done, pages_total) is called as table pages arrive.
     """
     print("[PMB] Starting PMB scraper...")
-    table_permits = _fetch_table_data()
+    session = _create_session()
+    limiter = _RateLimiter(MIN_REQUEST_INTERVAL)
+
+    # The map fetch runs alongside the table pages
+    try:
+        with ThreadPoolExecutor(max_workers=1) as map_executor:
+            map_future = map_executor.submit(_fetch_map_data, session, limiter)
+            table_permits = _fetch_table_data(session, limiter, progress=progress)
+            map_data = map_future.result()
+    finally:
+        session.close()
 
     if not table_permits:
         raise Exception("No permits fetched from PMB table API")
 
-    map_data = _fetch_map_data()
-
     print("[PMB] Filtering Sector 1 permits...")
     sector1_permits = _filter_sector1(table_permits, map_data)
 
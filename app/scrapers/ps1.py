@@ -4,13 +4,21 @@ Downloads XLS files and parses them into permit data.
 """
 
 import requests
+import hashlib
+import json
 import os
-import tempfile
+import threading
 from pathlib import Path
 from bs4 import BeautifulSoup
+from app.config import Config
 from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
 from datetime import datetime
-import time
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import itertools
+import multiprocessing
+import posixpath
 
 PAGE_URL = "https://primariasector1.ro/informatii-serviciul-urbanism/autorizatii-de-contruire-desfiintare/lista-autorizatiilor-de-construire/"
 
@@ -19,6 +27,29 @@ HEADERS = {
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
 }
 
+# Parallel downloads (kept low to stay polite) and parser processes
+DOWNLOAD_CONCURRENCY = int(os.getenv('PS1_DOWNLOAD_CONCURRENCY', 4))
+PARSE_WORKERS = int(os.getenv('PS1_PARSE_WORKERS', os.cpu_count() or 1))
+
+# Persistent cache of downloaded files and parsed results
+CACHE_DIR = os.path.join(Config.CACHE_DIR, 'ps1')
+
+# Bump when _parse_file output changes, so cached parse results are redone
+# (2: parse errors are no longer cached as empty results,
+#  3: hyperlinked cells keep their text, the link goes under its own key)
+PARSER_VERSION = 3
+
+# Key suffix of the hyperlink target of a cell, next to the cell's text
+LINK_SUFFIX = ' (link)'
+
+# Leading bytes of the spreadsheet formats linked from the PS1 page. Files are
+# told apart by content: some .xls links are XLSX files under another name.
+XLSX_MAGIC = b'PK\x03\x04'
+XLS_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # OLE2 (legacy BIFF .xls)
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
 
 def _fetch_page_links():
     """Fetch all XLS/XLSX file links from the webpage"""
@@ -53,26 +84,130 @@ def _fetch_page_links():
         raise Exception(f"Error fetching page: {e}")
 
 
-def _download_file(url, download_dir):
-    """Download a file to the downloads directory"""
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=60)
-        response.raise_for_status()
+def _create_session():
+    """Keep-alive session shared by the download threads"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=DOWNLOAD_CONCURRENCY)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
-        filename = os.path.basename(url.split('?')[0])
-        filepath = download_dir / filename
 
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+class _FileCache:
+    """
+    Persistent cache of PS1 source files and their parsed permits.
 
-        return filepath
+    Files are stored by the sha256 of their bytes, next to an index mapping
+    each URL to its ETag/Last-Modified and current hash. Parsed permits are
+    stored per hash (and parser version), so a file whose bytes haven't
+    changed is neither re-downloaded nor re-parsed.
+    """
 
-    except Exception:
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self.files_dir = self.dir / 'files'
+        self.parsed_dir = self.dir / 'parsed'
+        self.index_path = self.dir / 'index.json'
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self.parsed_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def file_path(self, sha, url):
+        ext = os.path.splitext(url.split('?')[0])[1].lower() or '.xlsx'
+        return self.files_dir / f'{sha}{ext}'
+
+    def parsed_path(self, sha):
+        return self.parsed_dir / f'{sha}.v{PARSER_VERSION}.json'
+
+    def entry(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+        if entry and self.file_path(entry['sha256'], url).exists():
+            return entry
         return None
 
+    def store(self, url, content, etag, last_modified):
+        sha = hashlib.sha256(content).hexdigest()
+        path = self.file_path(sha, url)
+        if not path.exists():
+            _write_atomic(path, content)
+        with self.lock:
+            self.index[url] = {'sha256': sha, 'etag': etag, 'last_modified': last_modified}
+        return sha
+
+    def load_parsed(self, sha, url):
+        try:
+            with open(self.parsed_path(sha)) as f:
+                permits = json.load(f)
+        except (OSError, ValueError):
+            return None
+        for permit in permits:
+            permit['source']['url'] = url
+        return permits
+
+    def save_parsed(self, sha, permits):
+        _write_atomic(self.parsed_path(sha), json.dumps(permits, ensure_ascii=False).encode('utf-8'))
+
+    def save_index(self, urls):
+        """Persist the index for urls and drop files no longer linked"""
+        with self.lock:
+            self.index = {url: entry for url, entry in self.index.items() if url in urls}
+            keep = {entry['sha256'] for entry in self.index.values()}
+            _write_atomic(self.index_path, json.dumps(self.index, indent=1).encode('utf-8'))
+
+        for folder in (self.files_dir, self.parsed_dir):
+            for path in folder.iterdir():
+                if path.name.split('.')[0] not in keep:
+                    path.unlink(missing_ok=True)
+
+
+def _write_atomic(path, content):
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _download_file(url, cache, session):
+    """
+    Fetch a file through the cache with a conditional GET.
+    Returns (sha256, changed) or (None, False) on failure.
+    """
+    try:
+        headers = {}
+        entry = cache.entry(url)
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = session.get(url, headers=headers, timeout=60)
+        if response.status_code == 304 and entry:
+            return entry['sha256'], False
+        response.raise_for_status()
+
+        sha = cache.store(
+            url,
+            response.content,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified')
+        )
+        return sha, not entry or entry['sha256'] != sha
 
-def _detect_header_row(sheet, max_check=15):
-    """Detect which row contains the headers"""
+    except Exception as e:
+        print(f"[PS1] Download of {url} failed: {e}")
+        return None, False
+
+
+def _detect_header_row(rows, max_check=15):
+    """Detect which row contains the headers (rows: iterable of value tuples)"""
     header_keywords = [
         'nr', 'numar', 'număr', 'data', 'dată', 'adresa', 'adresă',
         'beneficiar', 'strada', 'stradă', 'ac', 'ad', 'autorizat',
@@ -80,10 +215,9 @@ def _detect_header_row(sheet, max_check=15):
         'emiterii', 'inreg', 'cadastral', 'scopul'
     ]
 
-    max_row_to_check = min(max_check, sheet.max_row)
-
-    for row_idx in range(1, max_row_to_check + 1):
-        row = list(sheet.iter_rows(min_row=row_idx, max_row=row_idx, values_only=True))[0]
+    for row_idx, row in enumerate(rows, 1):
+        if row_idx > max_check:
+            break
 
         matches = 0
         non_empty = 0
@@ -118,72 +252,122 @@ def _find_address_column(headers):
     return None
 
 
-def _parse_file(filepath, file_url):
-    """Parse a single XLS file and extract permits"""
+def _read_hyperlinks(workbook, sheet):
+    """
+    Map (row, column) -> hyperlink target for a read-only sheet.
+    Read-only mode doesn't load hyperlinks, so they are streamed from the
+    sheet XML and its relationships file.
+    """
+    archive = workbook._archive
+    sheet_path = sheet._worksheet_path
+    folder, name = posixpath.split(sheet_path)
+    rels_path = posixpath.join(folder, '_rels', f'{name}.rels')
+
+    targets = {}
+    if rels_path in archive.namelist():
+        with archive.open(rels_path) as rels:
+            for _, elem in ElementTree.iterparse(rels):
+                if elem.tag.endswith('Relationship'):
+                    targets[elem.get('Id')] = elem.get('Target')
+
+    links = {}
+    with archive.open(sheet_path) as src:
+        for _, elem in ElementTree.iterparse(src):
+            if elem.tag == f'{{{SHEET_NS}}}hyperlink':
+                target = targets.get(elem.get(f'{{{REL_NS}}}id'))
+                if target and elem.get('ref'):
+                    min_col, min_row, max_col, max_row = range_boundaries(elem.get('ref'))
+                    for row in range(min_row, max_row + 1):
+                        for col in range(min_col, max_col + 1):
+                            links[(row, col)] = target
+            elif elem.tag == f'{{{SHEET_NS}}}row':
+                # Drop parsed rows as we go to keep memory flat
+                elem.clear()
+    return links
+
+
+def _iter_file_permits(file, file_url):
+    """Walk the active sheet of an XLSX file object once, yielding permits as rows are read"""
+    # A file object, since openpyxl rejects paths by extension
+    workbook = load_workbook(file, read_only=True, data_only=False)
     try:
-        workbook = load_workbook(filepath, data_only=False)
         sheet = workbook.active
+        hyperlinks = _read_hyperlinks(workbook, sheet)
+        rows = sheet.iter_rows(min_row=1, values_only=True)
 
-        header_row, headers = _detect_header_row(sheet)
+        # Header detection only needs the first few rows
+        head = list(itertools.islice(rows, 15))
+        header_row, headers = _detect_header_row(head)
 
         if header_row is None:
-            return []
+            return
 
         address_col = _find_address_column(headers)
         if address_col is None:
-            return []
+            return
 
-        permits = []
-        data_start_row = header_row + 1
+        data_rows = itertools.chain(head[header_row:], rows)
 
-        for row_idx in range(data_start_row, sheet.max_row + 1):
-            row_cells = list(sheet.iter_rows(min_row=row_idx, max_row=row_idx))[0]
-
-            if not any(cell.value for cell in row_cells if cell.value):
+        for row_idx, row_values in enumerate(data_rows, header_row + 1):
+            if not any(row_values):
                 continue
 
-            address_cell = row_cells[address_col] if address_col < len(row_cells) else None
-            if not address_cell or not address_cell.value:
+            address_value = row_values[address_col] if address_col < len(row_values) else None
+            if not address_value:
                 continue
 
-            address = str(address_cell.value).strip()
+            address = str(address_value).strip()
 
             data = {}
-            for col_idx, (header, cell) in enumerate(zip(headers, row_cells)):
-                if not header or not cell.value:
+            for col_idx, (header, value) in enumerate(zip(headers, row_values)):
+                if not header or not value:
                     continue
 
-                value = cell.value
-
-                if cell.hyperlink:
-                    value = cell.hyperlink.target
-                elif isinstance(value, datetime):
+                if isinstance(value, datetime):
                     value = value.strftime('%Y-%m-%d')
+                data[header] = str(value).strip()
 
-                value_str = str(value).strip()
-                data[header] = value_str
+                # The cell text stays the value (permit numbers are usually
+                # linked to their document); the link goes next to it
+                link = hyperlinks.get((row_idx, col_idx + 1))
+                if link:
+                    data[f'{header}{LINK_SUFFIX}'] = link
 
-            permit = {
+            yield {
                 'address': address,
                 'data': data,
                 'source': {
                     'issuer': 'ps1',
-                    'url': file_url
+                    'url': file_url,
+                    'row': row_idx
                 }
             }
+    finally:
+        workbook.close()
 
-            permits.append(permit)
 
-        return permits
-
-    except Exception:
-        return []
+def _parse_file(filepath, file_url):
+    """
+    Parse a single downloaded file and extract permits.
+    Files that aren't XLSX (legacy .xls, anything else) are skipped with no
+    permits. Errors reading an XLSX file propagate: an unreadable file must
+    not look like a file without permits.
+    """
+    with open(filepath, 'rb') as f:
+        magic = f.read(8)
+        if not magic.startswith(XLSX_MAGIC):
+            kind = 'legacy XLS' if magic == XLS_MAGIC else 'unknown format'
+            print(f"[PS1] Skipping {file_url}: {kind}, only XLSX files are read")
+            return []
+        f.seek(0)
+        return list(_iter_file_permits(f, file_url))
 
 
-def scrape_permits():
+def scrape_permits(progress=None):
     """
     Scrape building permits from Primaria Sector 1.
     Returns list of permit dictionaries.
+    progress(files_done, files_total) is called as files are parsed.
     """
     print("[PS1] Fetching file links from primariasector1.ro...")
     file_links = _fetch_page_links()
@@ -192,22 +376,74 @@ def scrape_permits():
         raise Exception("No XLS files found on PS1 page")
 
     print(f"[PS1] Found {len(file_links)} XLS files to process")
-    all_permits = []
+    results = [None] * len(file_links)
+    session = _create_session()
+    cache = _FileCache(CACHE_DIR)
+    reused = 0
 
-    # Use temp directory for downloads
-    with tempfile.TemporaryDirectory() as temp_dir:
-        download_dir = Path(temp_dir)
+    # Downloads run on threads (I/O bound), parsing on processes (CPU bound).
+    # spawn avoids forking a gunicorn worker that already runs other threads.
+    parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
 
-        for idx, file_info in enumerate(file_links, 1):
-            print(f"[PS1] [{idx}/{len(file_links)}] Processing: {file_info['original_filename']}")
-            filepath = _download_file(file_info['url'], download_dir)
+    try:
+        with parse_pool, ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as download_pool:
+            download_futures = {
+                download_pool.submit(_download_file, file_info['url'], cache, session): idx
+                for idx, file_info in enumerate(file_links)
+            }
 
-            if filepath:
-                permits = _parse_file(filepath, file_info['url'])
-                all_permits.extend(permits)
-                print(f"[PS1]   -> Extracted {len(permits)} permits (total: {len(all_permits)})")
+            # Hand each file to the parser pool as soon as its download finishes,
+            # unless the same bytes were already parsed on a previous run
+            parse_futures = {}
+            for future in as_completed(download_futures):
+                idx = download_futures[future]
+                url = file_links[idx]['url']
+                filename = file_links[idx]['original_filename']
+                sha, changed = future.result()
+                if not sha:
+                    # Fall back to the last downloaded copy; without one the file's
+                    # permits would be missing and the sync would delete them
+                    entry = cache.entry(url)
+                    if not entry:
+                        raise Exception(f"Download failed and no cached copy: {filename}")
+                    print(f"[PS1] [{idx + 1}/{len(file_links)}] Download failed, using cached copy: {filename}")
+                    sha = entry['sha256']
+                else:
+                    print(f"[PS1] [{idx + 1}/{len(file_links)}] {'Downloaded' if changed else 'Unchanged'}: {filename}")
 
-            time.sleep(0.3)
+                cached = cache.load_parsed(sha, url)
+                if cached is not None:
+                    results[idx] = cached
+                    reused += 1
+                else:
+                    parse_futures[parse_pool.submit(_parse_file, cache.file_path(sha, url), url)] = (idx, sha)
+
+            if progress:
+                progress(reused, len(parse_futures) + reused)
+
+            for files_done, future in enumerate(as_completed(parse_futures), 1):
+                idx, sha = parse_futures[future]
+                filename = file_links[idx]['original_filename']
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    # Not cached, so the file is parsed again on the next run
+                    raise Exception(f"Could not parse {filename}: {e}") from e
+                cache.save_parsed(sha, results[idx])
+                print(f"[PS1]   -> {filename}: extracted {len(results[idx])} permits")
+                if progress:
+                    progress(files_done + reused, len(parse_futures) + reused)
+    finally:
+        session.close()
+
+    cache.save_index({file_info['url'] for file_info in file_links})
+    print(f"[PS1] Reused cached results for {reused} unchanged files")
+
+    # Merge in the original file order
+    all_permits = []
+    for permits in results:
+        if permits:
+            all_permits.extend(permits)
 
     print(f"[PS1] Done! Total permits extracted: {len(all_permits)}")
     return all_permits
@@ -0,0 +1,249 @@
+"""
+Local indexes for permit search.
+
+The `permits` table is mirrored into a SQLite FTS5 file in Config.CACHE_DIR
+so every gunicorn worker on the container can search it without a network
+round trip. Addresses are folded before indexing and querying: lowercase,
+no diacritics (ș/ş/s, ă/a) and street abbreviations expanded (str. ->
+strada, bd. -> bulevardul), so "Stefan cel Mare" finds "Ștefan cel Mare".
+
+Cross-source duplicates (see app/dedup.py) are indexed as one merged row:
+the canonical permit with a `sources` list of every record behind it,
+searchable by any of their addresses.
+
+The index is rebuilt into a temporary file after each permits refresh and
+swapped in with an atomic rename.
+
+Permits with coordinates are also kept in an in-memory grid per worker for
+"permits near this point" queries, reloaded after each refresh.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from app.config import Config
+from app.db import supabase_admin
+from app.cache import VersionedCache
+from app.geo import PermitGrid
+
+INDEX_PATH = os.path.join(Config.CACHE_DIR, 'permits_index_v2.sqlite')
+
+# Abbreviation -> canonical word (matched after diacritics and dots are removed)
+ABBREVIATIONS = {
+    'str': 'strada',
+    'bd': 'bulevardul',
+    'bdul': 'bulevardul',
+    'b-dul': 'bulevardul',
+    'blvd': 'bulevardul',
+    'bulevard': 'bulevardul',
+    'sos': 'soseaua',
+    'sosea': 'soseaua',
+    'cal': 'calea',
+    'spl': 'splaiul',
+    'al': 'aleea',
+    'int': 'intrarea',
+    'intr': 'intrarea',
+    'pta': 'piata',
+    'p-ta': 'piata',
+    'prel': 'prelungirea',
+    'sect': 'sector',
+    'sec': 'sector',
+    'sc': 'scara',
+    'ap': 'apartament',
+}
+
+# Street types are often omitted or mixed up by people searching
+STREET_TYPES = {'strada', 'bulevardul', 'soseaua', 'calea', 'splaiul', 'aleea', 'intrarea', 'piata', 'prelungirea'}
+
+# Words that only add noise to an address match
+STOP_WORDS = {'nr', 'numar', 'numarul', 'no'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+
+_build_lock = threading.Lock()
+
+_geo_cache = VersionedCache('permits_geo', max_age=Config.PERMITS_CACHE_MAX_AGE)
+_geo_lock = threading.Lock()
+
+
+def fold_text(text):
+    """Lowercase and strip diacritics"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def address_tokens(address):
+    """Fold an address into canonical search tokens"""
+    tokens = []
+    for token in _TOKEN_RE.findall(fold_text(address)):
+        token = ABBREVIATIONS.get(token, token)
+        if token in STOP_WORDS:
+            continue
+        # Split "b-dul"-style leftovers and "10-12" ranges into separate words
+        tokens.extend(t for t in token.split('-') if t)
+    return tokens
+
+
+def permit_number(data):
+    """Best-effort permit number from the scraped data blob"""
+    for key, value in (data or {}).items():
+        key_folded = fold_text(key)
+        # "Nr. crt." is the row counter of the PS1 sheets, not the permit number
+        if key_folded == 'permit number' or (key_folded.startswith('nr') and 'crt' not in key_folded):
+            return str(value)
+    return ''
+
+
+def fetch_all_permits(columns='*', geolocated=False, canonical=None, page_size=1000):
+    """
+    Yield every permit row from Supabase, one page at a time.
+    canonical=True skips cross-source duplicates, False yields only them.
+    """
+    start = 0
+    while True:
+        query = supabase_admin.table('permits').select(columns)
+        if geolocated:
+            query = query.not_.is_('lat', 'null')
+        if canonical is True:
+            query = query.is_('canonical_id', 'null')
+        elif canonical is False:
+            query = query.not_.is_('canonical_id', 'null')
+        response = query.order('id').range(start, start + page_size - 1).execute()
+        rows = response.data or []
+        yield from rows
+        if len(rows) < page_size:
+            break
+        start += page_size
+
+
+def rebuild_index():
+    """Rebuild the local index from Supabase and swap it in atomically"""
+    with _build_lock:
+        os.makedirs(Config.CACHE_DIR, exist_ok=True)
+        tmp_path = f'{INDEX_PATH}.{os.getpid()}.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        # Duplicates (a small share) are held in memory and folded into their canonical permit
+        duplicates = {}
+        for permit in fetch_all_permits(canonical=False):
+            duplicates.setdefault(permit['canonical_id'], []).append(permit)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            # issuers is ",pmb,ps1," so an issuer filter also finds merged rows
+            conn.execute('CREATE TABLE permits (rowid INTEGER PRIMARY KEY, issuers TEXT, row_json TEXT)')
+            conn.execute("CREATE VIRTUAL TABLE permits_fts USING fts5(tokens, tokenize='unicode61')")
+
+            count = 0
+            for rowid, permit in enumerate(fetch_all_permits(canonical=True), 1):
+                records = [permit] + duplicates.pop(permit['id'], [])
+                tokens = []
+                for record in records:
+                    tokens += address_tokens(record.get('address'))
+                    tokens += address_tokens(permit_number(record.get('data')))
+                permit['sources'] = [
+                    {'id': r['id'], 'issuer': r['issuer'], 'address': r['address'], 'source_url': r.get('source_url')}
+                    for r in records
+                ]
+                issuers = ',' + ','.join(sorted({r['issuer'] for r in records})) + ','
+                conn.execute('INSERT INTO permits VALUES (?, ?, ?)',
+                             (rowid, issuers, json.dumps(permit, ensure_ascii=False)))
+                conn.execute('INSERT INTO permits_fts (rowid, tokens) VALUES (?, ?)',
+                             (rowid, ' '.join(tokens)))
+                count = rowid
+
+            conn.execute("INSERT INTO permits_fts (permits_fts) VALUES ('optimize')")
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(tmp_path, INDEX_PATH)
+        print(f"[SEARCH] Permit index rebuilt with {count} permits")
+        return count
+
+
+def rebuild_index_in_background():
+    """Build the index without blocking the caller (skipped if already running)"""
+    if _build_lock.locked():
+        return
+
+    def run():
+        try:
+            rebuild_index()
+        except Exception as e:
+            print(f"[SEARCH] Permit index rebuild failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def index_available():
+    return os.path.exists(INDEX_PATH)
+
+
+def search_permits(query, issuer=None, limit=50):
+    """
+    Ranked permit search on the local index.
+    Returns None when the index hasn't been built yet.
+    """
+    if not index_available():
+        return None
+
+    tokens = address_tokens(query)
+    # Street types are not required to match ("str. X" should find "calea X")
+    tokens = [t for t in tokens if t not in STREET_TYPES] or tokens
+    if not tokens:
+        return []
+
+    # Every token must match; the last one as a prefix (search-as-you-type)
+    terms = [f'"{t}"' for t in tokens[:-1]] + [f'"{tokens[-1]}"*']
+    match = ' '.join(terms)
+
+    sql = (
+        'SELECT p.row_json FROM permits_fts f JOIN permits p ON p.rowid = f.rowid '
+        'WHERE permits_fts MATCH ?'
+    )
+    params = [match]
+    if issuer:
+        sql += ' AND p.issuers LIKE ?'
+        params.append(f'%,{issuer},%')
+    sql += ' ORDER BY f.rank LIMIT ?'
+    params.append(limit)
+
+    conn = sqlite3.connect(f'file:{INDEX_PATH}?mode=ro', uri=True)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return [json.loads(row[0]) for row in rows]
+
+
+def _get_grid():
+    grid = _geo_cache.get('grid')
+    if grid is None:
+        with _geo_lock:
+            version = _geo_cache.version()
+            grid = _geo_cache.get('grid')
+            if grid is None:
+                rows = fetch_all_permits('id, issuer, address, lat, lng, data, source_url', geolocated=True)
+                grid = PermitGrid(
+                    dict(row, lat=float(row['lat']), lng=float(row['lng'])) for row in rows
+                )
+                _geo_cache.set('grid', grid, version)
+    return grid
+
+
+def permits_near(lat, lng, radius_m, limit=50):
+    """Geolocated permits within radius_m of a point, nearest first"""
+    return _get_grid().near(lat, lng, radius_m, limit)
+
+
+def invalidate_permits_geo():
+    """Call after permits change so workers reload the grid"""
+    try:
+        _geo_cache.invalidate()
+    except OSError as e:
+        print(f"[SEARCH] Failed to invalidate permits grid: {e}")
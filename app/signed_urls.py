@@ -0,0 +1,149 @@
+"""
+Signed URLs for report pictures.
+
+The `report-pictures` bucket is private, so pages link to pictures through
+signed URLs. All missing URLs of a page are requested in one
+create_signed_urls call and kept in memory per worker until shortly before
+they expire, so a warm report page makes no storage calls at all.
+
+storage3 fails the whole batch call when one of its objects is missing, so
+such a batch is signed again path by path, leaving out the failing ones.
+"""
+
+import threading
+import time
+from app.db import supabase_admin
+
+BUCKET = 'report-pictures'
+
+# How long a signed URL is valid
+URL_TTL = 3600
+
+# Cached URLs are dropped this long before they expire, so a page never
+# links to a URL that runs out while it is being viewed
+EXPIRY_MARGIN = 600
+
+# Upper bound on cached URLs per worker
+MAX_ENTRIES = 5000
+
+_cache = {}  # storage path -> (url, cache deadline on the monotonic clock)
+_lock = threading.Lock()
+
+
+def _evict(now):
+    """Drop expired entries, then the oldest ones if still over MAX_ENTRIES"""
+    for path in [p for p, (_, deadline) in _cache.items() if deadline <= now]:
+        del _cache[path]
+    overflow = len(_cache) - MAX_ENTRIES
+    if overflow > 0:
+        # dicts keep insertion order, so the first keys are the oldest
+        for path in list(_cache)[:overflow]:
+            del _cache[path]
+
+
+def _cached(paths, now):
+    """(urls found in the cache, paths still missing)"""
+    urls = {}
+    missing = []
+    with _lock:
+        for path in paths:
+            entry = _cache.get(path)
+            if entry and entry[1] > now:
+                urls[path] = entry[0]
+            else:
+                missing.append(path)
+    return urls, missing
+
+
+def _store(urls, response, now):
+    """Add a create_signed_urls response to urls and to the cache"""
+    deadline = now + URL_TTL - EXPIRY_MARGIN
+    with _lock:
+        for item in response:
+            if item.get('error') or not item.get('signedURL'):
+                print(f"[STORAGE] No signed URL for {item.get('path')}: {item.get('error')}")
+                continue
+            urls[item['path']] = item['signedURL']
+            _cache[item['path']] = (item['signedURL'], deadline)
+        _evict(now)
+    return urls
+
+
+def _signed(path, response):
+    """create_signed_url response -> create_signed_urls item"""
+    return {'path': path, 'signedURL': response['signedURL']}
+
+
+def signed_urls(paths):
+    """Map each storage path to a signed URL (paths that fail are left out)"""
+    now = time.monotonic()
+    urls, missing = _cached(paths, now)
+    if not missing:
+        return urls
+    bucket = supabase_admin.storage.from_(BUCKET)
+    try:
+        response = bucket.create_signed_urls(missing, URL_TTL)
+    except Exception as e:
+        print(f"[STORAGE] Batch signing failed, signing one by one: {e}")
+        response = []
+        for path in missing:
+            try:
+                response.append(_signed(path, bucket.create_signed_url(path, URL_TTL)))
+            except Exception as e:
+                print(f"[STORAGE] No signed URL for {path}: {e}")
+    return _store(urls, response, now)
+
+
+async def signed_urls_async(paths, client):
+    """signed_urls() through an async supabase client (app/asgi.py)"""
+    now = time.monotonic()
+    urls, missing = _cached(paths, now)
+    if not missing:
+        return urls
+    bucket = client.storage.from_(BUCKET)
+    try:
+        response = await bucket.create_signed_urls(missing, URL_TTL)
+    except Exception as e:
+        print(f"[STORAGE] Batch signing failed, signing one by one: {e}")
+        response = []
+        for path in missing:
+            try:
+                response.append(_signed(path, await bucket.create_signed_url(path, URL_TTL)))
+            except Exception as e:
+                print(f"[STORAGE] No signed URL for {path}: {e}")
+    return _store(urls, response, now)
+
+
+def _group(pictures, urls):
+    groups = {}
+    for pic in pictures:
+        key = pic.get('group_id') or pic['storage_path']
+        groups.setdefault(key, {})[pic.get('variant') or 'original'] = pic['storage_path']
+
+    result = []
+    for variants in groups.values():
+        original = variants.get('original')
+        if original not in urls:
+            continue
+        full_url = urls[original]
+        result.append({
+            'path': original,
+            'url': urls.get(variants.get('medium'), full_url),
+            'thumb_url': urls.get(variants.get('thumb'), full_url),
+            'full_url': full_url
+        })
+    return result
+
+
+def picture_urls(pictures):
+    """
+    Pictures rows -> one entry per uploaded picture for the templates:
+    {'path', 'url' (medium), 'thumb_url', 'full_url'}. Uploads from before
+    variants existed use their single file for all three.
+    """
+    return _group(pictures, signed_urls([pic['storage_path'] for pic in pictures]))
+
+
+async def picture_urls_async(pictures, client):
+    """picture_urls() through an async supabase client"""
+    return _group(pictures, await signed_urls_async([pic['storage_path'] for pic in pictures], client))
@@ -0,0 +1,79 @@
+"""
+Report statistics.
+
+Counts come from the `report_stats()` SQL function (one aggregate query
+grouped by day, status and type) instead of downloading every report. The
+result is cached per worker and invalidated when a report is created or
+changes status; every worker then reloads it on its next request.
+"""
+
+from collections import Counter
+from app.db import supabase
+from app.cache import VersionedCache
+
+_cache = VersionedCache('stats')
+
+
+def _counts(rows):
+    counts = Counter()
+    for row in (rows or []):
+        counts[(row['day'], row['status'], row['type'])] += row['count']
+    return counts
+
+
+def _load_counts():
+    """Fetch (day, status, type) -> count from the database"""
+    return _counts(supabase.rpc('report_stats').execute().data)
+
+
+def _get_counts():
+    version = _cache.version()
+    counts = _cache.get('counts')
+    if counts is None:
+        counts = _load_counts()
+        _cache.set('counts', counts, version)
+    return counts
+
+
+def _summarize(counts):
+    stats = {
+        'total': 0,
+        'by_status': {},
+        'by_type': {},
+        'by_day': {}
+    }
+
+    for (day, status, report_type), count in counts.items():
+        stats['total'] += count
+        stats['by_status'][status] = stats['by_status'].get(status, 0) + count
+        stats['by_type'][report_type] = stats['by_type'].get(report_type, 0) + count
+
+        day_stats = stats['by_day'].setdefault(day, {'total': 0, 'by_status': {}, 'by_type': {}})
+        day_stats['total'] += count
+        day_stats['by_status'][status] = day_stats['by_status'].get(status, 0) + count
+        day_stats['by_type'][report_type] = day_stats['by_type'].get(report_type, 0) + count
+
+    return stats
+
+
+def get_stats():
+    """Totals by status and type, plus a per-day breakdown"""
+    return _summarize(_get_counts())
+
+
+async def get_stats_async(client):
+    """get_stats() for the async routes (app/asgi.py), loading through an async client"""
+    version = _cache.version()
+    counts = _cache.get('counts')
+    if counts is None:
+        counts = _counts((await client.rpc('report_stats').execute()).data)
+        _cache.set('counts', counts, version)
+    return _summarize(counts)
+
+
+def invalidate_stats():
+    """Force a reload from the database (after any change to reports)"""
+    try:
+        _cache.invalidate()
+    except OSError as e:
+        print(f"[STATS] Failed to invalidate stats cache: {e}")
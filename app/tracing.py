@@ -0,0 +1,207 @@
+"""
+Per-request tracing of Supabase calls.
+
+The HTTP sessions behind the `supabase` and `supabase_admin` clients get
+httpx event hooks that time every PostgREST and Storage call made while a
+Flask request is being handled. Each call is recorded as a service, an
+operation, a table (or bucket / RPC name) and a query shape: the filter
+columns and operators with all values removed. A request that repeats the
+same shape N_PLUS_ONE_THRESHOLD times or more is flagged as a likely N+1
+loop.
+
+Summaries are kept in memory per worker for the admin /admin/perf page and
+can be sent back in a Server-Timing header. Only the route rule (never the
+URL with ids or query values), the method, the status and the timings are
+kept: no IP addresses, user agents or other request data.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qsl
+import httpx
+from flask import g, has_request_context, request
+from app.config import Config
+
+# Same query shape this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+# Recent requests kept per worker
+RECENT_REQUESTS = 200
+
+_METHOD_OPERATIONS = {'GET': 'select', 'HEAD': 'count', 'POST': 'insert', 'PATCH': 'update', 'DELETE': 'delete'}
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_REQUESTS)
+_routes = {}
+
+
+def _describe(request_obj):
+    """(service, operation, target, shape) of a Supabase HTTP request, without values"""
+    path = request_obj.url.path
+    method = request_obj.method
+
+    if '/rest/v1/' in path:
+        target = path.split('/rest/v1/', 1)[1]
+        if target.startswith('rpc/'):
+            operation, target = 'rpc', target[4:]
+        else:
+            operation = _METHOD_OPERATIONS.get(method, method.lower())
+            if method == 'POST' and 'resolution=merge-duplicates' in request_obj.headers.get('prefer', ''):
+                operation = 'upsert'
+        # Filter columns and operators only ("id=eq.?"), select/order kept whole
+        params = []
+        for key, value in parse_qsl(request_obj.url.query.decode('ascii', 'replace'), keep_blank_values=True):
+            if key in ('select', 'order', 'on_conflict', 'columns'):
+                params.append(f'{key}={value}')
+            elif key in ('limit', 'offset'):
+                params.append(key)
+            else:
+                params.append(f"{key}={value.split('.', 1)[0]}.?")
+        shape = f"{method} {target}?{'&'.join(sorted(params))}"
+        return 'postgrest', operation, target, shape
+
+    if '/storage/v1/' in path:
+        parts = path.split('/storage/v1/', 1)[1].split('/')
+        # object/sign/<bucket>/..., object/<bucket>/<path>, bucket/...
+        if parts[0] == 'object' and len(parts) > 2 and parts[1] in ('sign', 'public', 'authenticated', 'list'):
+            operation, target = parts[1], parts[2]
+        elif parts[0] == 'object' and len(parts) > 1:
+            operation = {'POST': 'upload', 'PUT': 'update', 'DELETE': 'remove'}.get(method, 'download')
+            target = parts[1]
+        else:
+            operation, target = method.lower(), parts[0]
+        return 'storage', operation, target, f"{method} storage {operation} {target}"
+
+    return 'other', method.lower(), path, f"{method} {path}"
+
+
+def _on_request(request_obj):
+    if has_request_context() and 'db_calls' in g:
+        request_obj.extensions['trace_started'] = time.perf_counter()
+
+
+def _on_response(response):
+    started = response.request.extensions.get('trace_started')
+    if started is None or not has_request_context() or 'db_calls' not in g:
+        return
+    service, operation, target, shape = _describe(response.request)
+    g.db_calls.append({
+        'service': service,
+        'operation': operation,
+        'target': target,
+        'shape': shape,
+        'status': response.status_code,
+        'ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+
+def instrument_client(client, name):
+    """Add the timing hooks to the PostgREST and Storage sessions of a supabase client"""
+    for service in ('postgrest', 'storage'):
+        session = getattr(getattr(client, service, None), 'session', None)
+        if not isinstance(session, httpx.Client):
+            print(f"[TRACE] Could not instrument {name}.{service}")
+            continue
+        hooks = session.event_hooks
+        session.event_hooks = {
+            'request': hooks['request'] + [_on_request],
+            'response': hooks['response'] + [_on_response]
+        }
+
+
+def _before_request():
+    g.db_calls = []
+    g.trace_started = time.perf_counter()
+
+
+def _after_request(response):
+    if 'db_calls' not in g:
+        return response
+
+    calls = g.db_calls
+    total_ms = round((time.perf_counter() - g.trace_started) * 1000, 1)
+    db_ms = round(sum(call['ms'] for call in calls), 1)
+    repeated = {
+        shape: count
+        for shape, count in Counter(call['shape'] for call in calls).items()
+        if count >= N_PLUS_ONE_THRESHOLD
+    }
+    route = request.url_rule.rule if request.url_rule else '(unmatched)'
+
+    _record({
+        'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'route': route,
+        'method': request.method,
+        'status': response.status_code,
+        'total_ms': total_ms,
+        'db_ms': db_ms,
+        'calls': calls,
+        'n_plus_one': repeated
+    })
+
+    if repeated:
+        print(f"[TRACE] Possible N+1 in {request.method} {route}: " +
+              ', '.join(f'{count}x {shape}' for shape, count in repeated.items()))
+
+    if Config.SERVER_TIMING:
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms};desc="{len(calls)} Supabase calls", app;dur={total_ms}'
+        )
+    return response
+
+
+def _record(summary):
+    key = f"{summary['method']} {summary['route']}"
+    with _lock:
+        _recent.append(summary)
+        stats = _routes.setdefault(key, {
+            'route': summary['route'], 'method': summary['method'], 'requests': 0,
+            'calls': 0, 'db_ms': 0.0, 'total_ms': 0.0, 'max_ms': 0.0, 'n_plus_one': 0, 'shapes': Counter()
+        })
+        stats['requests'] += 1
+        stats['calls'] += len(summary['calls'])
+        stats['db_ms'] += summary['db_ms']
+        stats['total_ms'] += summary['total_ms']
+        stats['max_ms'] = max(stats['max_ms'], summary['total_ms'])
+        if summary['n_plus_one']:
+            stats['n_plus_one'] += 1
+            stats['shapes'].update(summary['n_plus_one'])
+
+
+def perf_snapshot():
+    """Per-route aggregates and recent requests of this worker, for /admin/perf"""
+    with _lock:
+        routes = []
+        for stats in _routes.values():
+            requests = stats['requests']
+            routes.append({
+                'route': stats['route'],
+                'method': stats['method'],
+                'requests': requests,
+                'avg_calls': round(stats['calls'] / requests, 1),
+                'avg_db_ms': round(stats['db_ms'] / requests, 1),
+                'avg_ms': round(stats['total_ms'] / requests, 1),
+                'max_ms': stats['max_ms'],
+                'n_plus_one': stats['n_plus_one'],
+                'n_plus_one_shapes': stats['shapes'].most_common(3)
+            })
+        recent = list(reversed(_recent))
+
+    routes.sort(key=lambda r: r['avg_db_ms'] * r['requests'], reverse=True)
+    return {'pid': os.getpid(), 'routes': routes, 'recent': recent}
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _routes.clear()
+
+
+def init_app(app):
+    """Start tracing requests of app (no-op when DB_TRACING is off)"""
+    if not Config.DB_TRACING:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,211 @@
+"""
+Background processing of report pictures.
+
+create_report commits the report row and hands the spooled uploads (see
+app/ingest.py) to a bounded thread pool. Each picture is resized into its variants (see
+app/images.py) and uploaded in parallel; once the whole batch is done all
+`pictures` rows (one per variant) are written in one bulk insert and
+`reports.pictures_status` is set to 'done' (or 'error').
+
+Pictures being processed, and the bytes of those queued, are counted by
+app/admission.py so new submissions can be turned away when this process is
+busy.
+
+Queued pictures live only in this process: if the worker is restarted or
+killed mid-batch they are lost. recover_stuck_pictures() marks reports still
+'processing' after PROCESSING_STALE_AFTER as 'error'; it runs after
+submissions (at most every RECOVERY_INTERVAL per process) and with each
+permits refresh.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from app import admission
+from app.config import Config
+from app.db import supabase, supabase_admin
+from app.helpers import strip_exif
+from app.images import make_variants, variant_path, CONTENT_TYPE
+from app.ingest import FORMATS
+from app.cache import invalidate_reports
+
+BUCKET = 'report-pictures'
+
+_executor = ThreadPoolExecutor(max_workers=Config.UPLOAD_WORKERS, thread_name_prefix='upload')
+
+# Bounds the number of pictures queued or in flight in this process
+_slots = threading.BoundedSemaphore(Config.UPLOAD_QUEUE_MAX)
+
+# A report whose pictures are still 'processing' after this long lost its batch
+PROCESSING_STALE_AFTER = timedelta(minutes=30)
+
+# Seconds between two recovery runs triggered by submissions, per process
+RECOVERY_INTERVAL = 600
+
+_recovery_lock = threading.Lock()
+_last_recovery = 0.0
+
+
+def _process_picture(report_id, picture):
+    """Resize and upload a single picture (app.ingest.Picture), return its `pictures` rows"""
+    with picture.file:
+        return _upload_variants(report_id, picture)
+
+
+def _upload_variants(report_id, picture):
+    group_id = str(uuid.uuid4())
+    try:
+        variants = make_variants(picture.file)
+    except Exception as e:
+        # Pillow can't decode it: keep the upload as-is, metadata stripped
+        print(f"[UPLOAD] No variants for a picture of report {report_id}: {e}")
+        ext, content_type = FORMATS[picture.format]
+        filename = f"{report_id}/{group_id}.{ext}"
+        picture.file.seek(0)
+        image_data = picture.file.read()
+        supabase.storage.from_(BUCKET).upload(filename, strip_exif(image_data), {'content-type': content_type})
+        return [{
+            'report_id': report_id,
+            'storage_path': filename,
+            'variant': 'original',
+            'group_id': group_id,
+            'width': None,
+            'height': None
+        }]
+
+    rows = []
+    for variant, data, width, height in variants:
+        filename = variant_path(report_id, group_id, variant)
+        supabase.storage.from_(BUCKET).upload(filename, data, {'content-type': CONTENT_TYPE})
+        rows.append({
+            'report_id': report_id,
+            'storage_path': filename,
+            'variant': variant,
+            'group_id': group_id,
+            'width': width,
+            'height': height
+        })
+    return rows
+
+
+def _save_pictures(report_id, picture_rows, status):
+    """Bulk insert picture rows and record the processing outcome"""
+    if picture_rows:
+        supabase_admin.table('pictures').insert(picture_rows).execute()
+
+    supabase_admin.table('reports').update({'pictures_status': status}).eq('id', report_id).execute()
+    invalidate_reports()
+
+
+def process_pictures(report_id, pictures):
+    """Strip and upload pictures in the request thread (synchronous mode)"""
+    picture_rows = []
+    failed = False
+    admission.hold(image_jobs=len(pictures))
+    try:
+        for index, picture in enumerate(pictures):
+            try:
+                picture_rows.extend(_process_picture(report_id, picture))
+            except Exception as e:
+                # The report is already saved: record the failure, don't fail the request
+                print(f"[UPLOAD] Picture {index + 1} of report {report_id} failed: {e}")
+                failed = True
+    finally:
+        admission.release(image_jobs=len(pictures))
+    _save_pictures(report_id, picture_rows, 'error' if failed else 'done')
+
+
+class _ReportBatch:
+    """Collects the results of one report's pictures as they finish"""
+
+    def __init__(self, report_id, sizes):
+        self.report_id = report_id
+        self.sizes = sizes
+        self.remaining = len(sizes)
+        self.picture_rows = [None] * len(sizes)
+        self.failed = False
+        self.lock = threading.Lock()
+
+    def done(self, index, future):
+        _slots.release()
+        admission.release(self.sizes[index], image_jobs=1)
+        try:
+            self.picture_rows[index] = future.result()
+        except Exception as e:
+            print(f"[UPLOAD] Picture {index + 1} of report {self.report_id} failed: {e}")
+            with self.lock:
+                self.failed = True
+
+        with self.lock:
+            self.remaining -= 1
+            finished = self.remaining == 0
+        if not finished:
+            return
+
+        with self.lock:
+            failed = self.failed
+        try:
+            _save_pictures(
+                self.report_id,
+                [row for rows in self.picture_rows if rows for row in rows],
+                'error' if failed else 'done'
+            )
+        except Exception as e:
+            print(f"[UPLOAD] Saving pictures of report {self.report_id} failed: {e}")
+
+
+def submit_pictures(report_id, pictures):
+    """
+    Queue pictures for background processing.
+    Returns False (nothing queued) when the pool is saturated, so the caller
+    can process them synchronously instead.
+    """
+    acquired = 0
+    for _ in pictures:
+        if not _slots.acquire(blocking=False):
+            for _ in range(acquired):
+                _slots.release()
+            return False
+        acquired += 1
+
+    # The picture bytes outlive the request until each picture is done
+    sizes = [picture.size for picture in pictures]
+    admission.hold(sum(sizes), image_jobs=len(pictures))
+
+    batch = _ReportBatch(report_id, sizes)
+    for index, picture in enumerate(pictures):
+        future = _executor.submit(_process_picture, report_id, picture)
+        future.add_done_callback(lambda f, i=index: batch.done(i, f))
+    return True
+
+
+def recover_stuck_pictures():
+    """Mark reports whose picture batch was lost as 'error', return how many"""
+    cutoff = (datetime.now(timezone.utc) - PROCESSING_STALE_AFTER).strftime('%Y-%m-%dT%H:%M:%SZ')
+    response = supabase_admin.table('reports').update({'pictures_status': 'error'}) \
+        .eq('pictures_status', 'processing').lt('created_at', cutoff).execute()
+    recovered = len(response.data or [])
+    if recovered:
+        print(f"[UPLOAD] Marked {recovered} reports with lost pictures as 'error'")
+        invalidate_reports()
+    return recovered
+
+
+def recover_stuck_pictures_soon():
+    """Run recover_stuck_pictures() in the background, at most every RECOVERY_INTERVAL"""
+    global _last_recovery
+    with _recovery_lock:
+        now = time.monotonic()
+        if _last_recovery and now - _last_recovery < RECOVERY_INTERVAL:
+            return
+        _last_recovery = now
+
+    def run():
+        try:
+            recover_stuck_pictures()
+        except Exception as e:
+            print(f"[UPLOAD] Recovering stuck pictures failed: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,190 @@
+"""
+Synthetic inputs for the benchmarks, generated offline with a fixed seed.
+
+Sizes follow production: phone photos of a few MB with GPS EXIF, report lists
+of tens of thousands of rows, the full Bucharest PMB table (all six sectors)
+with its map layer, and PS1 XLSX files with title rows above the header and
+hyperlinked permit numbers.
+"""
+
+import io
+import random
+from datetime import datetime, timedelta
+from PIL import Image, ImageFilter
+from PIL.PngImagePlugin import PngInfo
+
+SEED = 1
+
+STREET_TYPES = ['Strada', 'Bulevardul', 'Calea', 'Soseaua', 'Aleea', 'Piata']
+STREETS = [
+    'Ion Campineanu', 'Aviatorilor', 'Dorobantilor', 'Mihai Eminescu', 'Victoriei',
+    'Banu Manta', 'Ion Mihalache', 'Buzesti', 'Polona', 'Turturelelor', 'Jiului',
+    'Bucurestii Noi', 'Pajurei', 'Straulesti', 'Elena Vacarescu', 'Nicolae Titulescu'
+]
+REPORT_TYPES = ['no-paperwork', 'noise-violation', 'pollution-violation', 'others']
+REPORT_STATUSES = ['pending', 'in-review', 'validated', 'rejected', 'resolved']
+
+# Stereo70 box of Bucharest, as queried from the map API
+BBOX = (573000, 314000, 602000, 340000)
+
+
+def _rng(name):
+    return random.Random(f'{SEED}:{name}')
+
+
+def _photo(width, height):
+    """Noisy gradient: compresses like a photo, unlike flat colours"""
+    noise = Image.effect_noise((width, height), 40).filter(ImageFilter.BoxBlur(1))
+    gradient = Image.linear_gradient('L').resize((width, height))
+    return Image.merge('RGB', (noise, gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+def _exif(rng):
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation: rotated, as phones save portrait shots
+    exif[0x010F] = 'Camera Maker'
+    exif[0x0110] = 'Camera Model'
+    exif[0x0132] = '2024:05:12 10:30:00'
+    exif[0xA431] = f'SN{rng.randrange(10 ** 9)}'
+    gps = exif.get_ifd(0x8825)
+    gps[1], gps[2] = 'N', (44.0, 27.0, rng.uniform(0, 60))
+    gps[3], gps[4] = 'E', (26.0, 5.0, rng.uniform(0, 60))
+    return exif
+
+
+def images():
+    """{name: bytes}: JPEG, PNG and WebP photos at upload sizes, all carrying EXIF"""
+    rng = _rng('images')
+    result = {}
+    for label, size in (('small', (1024, 768)), ('phone', (4032, 3024))):
+        photo = _photo(*size)
+        exif = _exif(rng).tobytes()
+
+        output = io.BytesIO()
+        photo.save(output, format='JPEG', quality=90, exif=exif)
+        result[f'jpeg-{label}'] = output.getvalue()
+
+        output = io.BytesIO()
+        photo.save(output, format='WEBP', quality=85, exif=exif)
+        result[f'webp-{label}'] = output.getvalue()
+
+    # Screenshots are the usual PNG uploads: smaller, with text chunks
+    info = PngInfo()
+    info.add_text('Comment', 'Screenshot')
+    info.add_text('XML:com.adobe.xmp', '<x:xmpmeta>' + 'x' * 2000 + '</x:xmpmeta>')
+    output = io.BytesIO()
+    _photo(1170, 2532).save(output, format='PNG', pnginfo=info, exif=_exif(rng).tobytes())
+    result['png-screenshot'] = output.getvalue()
+    return result
+
+
+def report_rows(count):
+    """Rows as returned by `reports` selects with pictures and comments embedded"""
+    rng = _rng('reports')
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        report_id = f'{i:08x}-0000-4000-8000-{rng.randrange(16 ** 12):012x}'
+        rows.append({
+            'id': report_id,
+            'type': rng.choice(REPORT_TYPES),
+            'status': rng.choice(REPORT_STATUSES),
+            'created_at': (start + timedelta(minutes=7 * i)).isoformat() + '+00:00',
+            'description': 'Lucrari fara autorizatie afisata, zgomot dupa ora 22. ' * rng.randint(0, 4),
+            'location_lat': f'{44.44 + rng.uniform(0, 0.08):.7f}',
+            'location_lng': f'{26.03 + rng.uniform(0, 0.08):.7f}',
+            'address': f'{rng.choice(STREET_TYPES)} {rng.choice(STREETS)} {rng.randint(1, 200)}, Sector 1',
+            'pictures': [
+                {'storage_path': f'{report_id}/{n}/thumb.webp'} for n in range(rng.randint(0, 4))
+            ],
+            'comments': []
+        })
+    return rows
+
+
+def pmb_payloads(count, mapped=0.7):
+    """(table rows, map features by id) for `count` permits of all sectors"""
+    rng = _rng('pmb')
+    table = []
+    map_data = {}
+    for i in range(count):
+        permit_id = 100000 + i
+        table.append({
+            'id': permit_id,
+            'fld_46': f'{rng.randint(1, 1500)}/{rng.randint(2015, 2025)}',
+            'fld_47': f'{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00',
+            'fld_48_fktext': rng.choice(STREET_TYPES),
+            'fld_55': rng.choice(STREETS),
+            'fld_56': str(rng.randint(1, 200)),
+            'fld_57': str(rng.randint(1, 6)),
+            'fld_58': 'Construire imobil P+4E, imprejmuire, organizare de santier',
+            'fld_63': f'{rng.randint(1, 3000)}/{rng.randint(2014, 2025)}',
+            'fld_64': f'SC BENEFICIAR {rng.randint(1, 999)} SRL',
+            'fld_65': str(rng.randint(200000, 299999)),
+        })
+        if rng.random() < mapped:
+            map_data[str(permit_id)] = {
+                'id': permit_id,
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'MultiPoint',
+                    'coordinates': [[rng.uniform(BBOX[0], BBOX[2]), rng.uniform(BBOX[1], BBOX[3])]]
+                },
+                'properties': {
+                    'nr_ac': table[-1]['fld_46'],
+                    'valoare': str(rng.randint(10000, 5000000)),
+                    'exec_valab': '24 luni',
+                    'functiune': 'locuinte colective'
+                }
+            }
+    return table, map_data
+
+
+PS1_HEADERS = [
+    'Nr. crt.', 'Nr. AC', 'Data emiterii', 'Beneficiar', 'Adresa imobil',
+    'Descrierea lucrarilor', 'Nr. cadastral'
+]
+
+
+def ps1_rows(count, rng):
+    start = datetime(2024, 1, 2)
+    for i in range(count):
+        yield [
+            i + 1,
+            f'{i + 1}/{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024',
+            start + timedelta(days=i % 360),
+            f'Beneficiar {rng.randint(1, 999)}',
+            f'{rng.choice(STREET_TYPES)} {rng.choice(STREETS)} nr. {rng.randint(1, 200)}',
+            'Desfiintare constructie existenta si construire imobil',
+            str(rng.randint(200000, 299999)),
+        ]
+
+
+def ps1_workbook(path, count):
+    """XLSX laid out like the PS1 lists: title rows, header, hyperlinked permit numbers"""
+    from openpyxl import Workbook
+
+    rng = _rng(f'ps1:{count}')
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['LISTA AUTORIZATIILOR DE CONSTRUIRE / DESFIINTARE EMISE IN ANUL 2024'])
+    sheet.append([])
+    sheet.append(PS1_HEADERS)
+    for row_idx, row in enumerate(ps1_rows(count, rng), 4):
+        sheet.append(row)
+        if row_idx % 4 == 0:
+            sheet.cell(row=row_idx, column=2).hyperlink = f'https://primariasector1.ro/ac/{row_idx}.pdf'
+    workbook.save(path)
+
+
+def ps1_heads(count):
+    """First rows of `count` sheets, with the header anywhere in rows 1-10"""
+    rng = _rng('ps1-heads')
+    heads = []
+    for _ in range(count):
+        title_rows = [[f'Lista autorizatii {rng.randint(2015, 2025)}'], [None] * len(PS1_HEADERS)]
+        head = title_rows[:rng.randint(0, 2)] + [[None] * len(PS1_HEADERS)] * rng.randint(0, 7)
+        head.append(PS1_HEADERS)
+        head.extend(ps1_rows(15 - len(head), rng))
+        heads.append([tuple(row) for row in head])
+    return heads
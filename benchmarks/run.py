@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmarks for the CPU hot paths: EXIF stripping, report
+formatting, PMB sector filtering and PS1 XLSX parsing.
+
+Each case runs on synthetic inputs (benchmarks/fixtures.py), is timed over
+several repeats and then run once more under tracemalloc for its peak Python
+memory. Results can be saved as a baseline and later runs compared against
+it; the exit status is 1 when a case got slower or hungrier than the
+tolerance allows.
+
+    python benchmarks/run.py                      # run and print
+    python benchmarks/run.py --save baseline.json # record a baseline
+    python benchmarks/run.py --compare baseline.json
+    python benchmarks/run.py --only ps1           # cases whose name contains "ps1"
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures  # noqa: E402
+from app.helpers import strip_exif, format_report  # noqa: E402
+from app.scrapers import pmb, ps1  # noqa: E402
+
+# A case is slower / hungrier than its baseline by more than this fraction -> regression
+DEFAULT_TOLERANCE = 0.25
+
+# Each case is repeated until both limits are reached
+MIN_REPEATS = 5
+MIN_SECONDS = 1.0
+
+# setup() builds the input outside of the timing; run(input) is what gets
+# measured and returns something check(input, result) can validate;
+# size(input) is the work done per run, in `unit`
+Case = namedtuple('Case', ['name', 'setup', 'run', 'size', 'unit', 'check'])
+
+
+def _image_cases():
+    cases = []
+    images = {}
+
+    def load(name):
+        def setup():
+            if not images:
+                images.update(fixtures.images())
+            return images[name]
+        return setup
+
+    for name in ('jpeg-small', 'jpeg-phone', 'webp-small', 'webp-phone', 'png-screenshot'):
+        cases.append(Case(
+            f'strip_exif/{name}', load(name), strip_exif,
+            size=lambda data: len(data) / 1e6, unit='MB',
+            check=lambda data, result: b'Camera Model' in data and b'Camera Model' not in result
+        ))
+    return cases
+
+
+def _ps1_check(count):
+    """All rows parsed, and hyperlinked permit numbers keep their cell text"""
+    def check(path, result):
+        linked = [p['data'] for p in result if 'Nr. AC' + ps1.LINK_SUFFIX in p['data']]
+        return len(result) == count and bool(linked) and all(
+            data['Nr. AC' + ps1.LINK_SUFFIX].startswith('https://')
+            and data['Nr. AC'].split('/')[0].isdigit()
+            for data in linked
+        )
+    return check
+
+
+def _cases(workdir):
+    def xlsx(count):
+        def setup():
+            path = os.path.join(workdir, f'ps1-{count}.xlsx')
+            if not os.path.exists(path):
+                fixtures.ps1_workbook(path, count)
+            return path
+        return setup
+
+    return _image_cases() + [
+        Case(
+            'format_report/50k', lambda: fixtures.report_rows(50000),
+            lambda rows: [format_report(row) for row in rows],
+            size=len, unit='reports',
+            check=lambda rows, result: len(result) == len(rows)
+        ),
+        Case(
+            'pmb._filter_sector1/60k', lambda: fixtures.pmb_payloads(60000),
+            lambda payload: pmb._filter_sector1(*payload),
+            size=lambda payload: len(payload[0]), unit='rows',
+            check=lambda payload, result: 0 < len(result) < len(payload[0]) and any(p['lat'] for p in result)
+        ),
+        Case(
+            'ps1._detect_header_row/1k', lambda: fixtures.ps1_heads(1000),
+            lambda heads: [ps1._detect_header_row(head) for head in heads],
+            size=len, unit='sheets',
+            check=lambda heads, result: all(row is not None for row, _ in result)
+        ),
+        Case(
+            'ps1._parse_file/2k', xlsx(2000),
+            lambda path: ps1._parse_file(path, 'https://example.org/ps1.xlsx'),
+            size=lambda path: 2000, unit='rows',
+            check=_ps1_check(2000)
+        ),
+        Case(
+            'ps1._parse_file/20k', xlsx(20000),
+            lambda path: ps1._parse_file(path, 'https://example.org/ps1.xlsx'),
+            size=lambda path: 20000, unit='rows',
+            check=_ps1_check(20000)
+        ),
+    ]
+
+
+def measure(case):
+    """Time case.run over several repeats, then record its peak memory once"""
+    data = case.setup()
+    result = case.run(data)  # warm-up, and the result to validate
+    if not case.check(data, result):
+        raise AssertionError(f'{case.name}: unexpected result')
+    del result
+
+    times = []
+    started = time.perf_counter()
+    while len(times) < MIN_REPEATS or time.perf_counter() - started < MIN_SECONDS:
+        gc.collect()
+        t0 = time.perf_counter()
+        case.run(data)
+        times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    case.run(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        'repeats': len(times),
+        'median_ms': round(median * 1000, 3),
+        'min_ms': round(min(times) * 1000, 3),
+        'throughput': round(case.size(data) / median, 1),
+        'unit': f'{case.unit}/s',
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each case against the baseline, and whether any regressed"""
+    lines = []
+    regressed = False
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            lines.append(f'  {name:<32} (not in baseline)')
+            continue
+        time_ratio = result['median_ms'] / base['median_ms']
+        memory_ratio = result['peak_kb'] / base['peak_kb'] if base['peak_kb'] else 1.0
+        flags = []
+        if time_ratio > 1 + tolerance:
+            flags.append('SLOWER')
+        if memory_ratio > 1 + tolerance:
+            flags.append('MORE MEMORY')
+        regressed = regressed or bool(flags)
+        lines.append(
+            f'  {name:<32} time {time_ratio:6.2f}x  memory {memory_ratio:6.2f}x  {" ".join(flags)}'
+        )
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', help='run only cases whose name contains this text')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'allowed slowdown / memory growth (default {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='raportare-bench-') as workdir:
+        cases = [c for c in _cases(workdir) if not args.only or args.only in c.name]
+        if not cases:
+            parser.error(f'no case matches {args.only!r}')
+
+        print(f"{'case':<32} {'median':>10} {'throughput':>22} {'peak memory':>14}")
+        for case in cases:
+            result = measure(case)
+            results[case.name] = result
+            print(f"{case.name:<32} {result['median_ms']:>8.1f}ms "
+                  f"{result['throughput']:>14,.1f} {result['unit']:<9}{result['peak_kb'] / 1024:>9.1f} MB")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'results': results
+            }, f, indent=2)
+        print(f'\nBaseline saved to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nAgainst {args.compare} ({baseline.get('machine')}, Python {baseline.get('python')}):")
+        lines, regressed = compare(results, baseline['results'], args.tolerance)
+        print('\n'.join(lines))
+        if regressed:
+            print(f'\nRegression: over {args.tolerance:.0%} slower or more memory than the baseline')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Supabase REST (PostgREST) and Storage APIs, for load
+tests that must not touch the production project.
+
+Tables live in memory and are seeded with synthetic reports, pictures,
+comments, permits and a validator account. Only what the app's routes use is
+implemented:
+
+- select with embedded resources ("*, pictures(storage_path)",
+  "comments(count)", "permits(id, address)"), eq/neq/gt/gte/lt/lte/like/
+  ilike/is/in filters, not., or=(... and(...)), order, limit and offset
+- insert, upsert (on_conflict), update and delete with the same filters,
+  with column defaults, unique keys and ON DELETE CASCADE of the schema
+- the report_stats and set_permit_canonical RPCs
+- storage upload, remove, create_signed_url and create_signed_urls
+
+Every response can be delayed by --latency-ms to stand in for the network
+round trip to Supabase. There is no auth and no RLS: both keys see all rows.
+
+    python loadtest/fake_supabase.py --port 54321 --reports 5000 --permits 20000
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Any three dot-separated parts pass the client's key check
+FAKE_KEY = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.loadtest'
+
+VALIDATOR_USERNAME = 'loadtest-validator'
+VALIDATOR_PASSWORD = 'loadtest'
+
+# Sector 1 bounding box (WGS84)
+SECTOR1_BBOX = (44.45, 26.02, 44.53, 26.12)
+
+STREET_TYPES = ['Strada', 'Bulevardul', 'Calea', 'Soseaua', 'Aleea']
+STREETS = [
+    'Ion Campineanu', 'Aviatorilor', 'Dorobantilor', 'Mihai Eminescu', 'Victoriei',
+    'Banu Manta', 'Ion Mihalache', 'Buzesti', 'Polona', 'Turturelelor', 'Jiului',
+    'Bucurestii Noi', 'Pajurei', 'Straulesti', 'Elena Vacarescu', 'Nicolae Titulescu'
+]
+REPORT_TYPES = ['no-paperwork', 'noise-violation', 'pollution-violation', 'others']
+REPORT_STATUSES = ['pending', 'in-review', 'validated', 'rejected', 'resolved']
+
+# Column defaults of schema.sql (id and timestamps are added to every table)
+DEFAULTS = {
+    'reports': {'status': 'pending', 'pictures_status': 'done', 'matched_at': None,
+                'submitted_by_user_id': None, 'submitted_by_username': None,
+                'address': None, 'description': None},
+    'pictures': {'variant': 'original', 'group_id': None, 'width': None, 'height': None},
+    'comments': {'user_id': None},
+    'contact_messages': {'email': None, 'read': False, 'admin_notes': None},
+    'permits': {'lat': None, 'lng': None, 'canonical_id': None, 'source_url': None},
+    'permit_jobs': {'status': 'queued', 'phase': None, 'items_done': 0, 'items_total': 0,
+                    'permits_scraped': 0, 'rows_written': 0, 'elapsed_seconds': 0,
+                    'message': None, 'error_message': None, 'finished_at': None},
+    'report_permit_matches': {'distance_m': None},
+}
+
+# Tables whose primary key is not a generated uuid `id`
+NATURAL_KEYS = {'permits_metadata': 'issuer'}
+
+UNIQUE = {
+    'official_users': [('username',)],
+    'permits': [('issuer', 'natural_key')],
+    'report_permit_matches': [('report_id', 'permit_id')],
+    'permits_metadata': [('issuer',)],
+}
+
+# parent table -> [(child table, foreign key column)]
+CASCADE = {
+    'reports': [('pictures', 'report_id'), ('comments', 'report_id'),
+                ('report_permit_matches', 'report_id'), ('reports_history', 'report_id')],
+    'permits': [('report_permit_matches', 'permit_id')],
+}
+
+# (table, embedded name) -> (embedded table, foreign key, 'many' | 'one')
+# 'many': the foreign key is on the embedded table; 'one': it is on `table`
+EMBEDS = {
+    ('reports', 'pictures'): ('pictures', 'report_id', 'many'),
+    ('reports', 'comments'): ('comments', 'report_id', 'many'),
+    ('reports', 'report_permit_matches'): ('report_permit_matches', 'report_id', 'many'),
+    ('report_permit_matches', 'permits'): ('permits', 'permit_id', 'one'),
+    ('report_permit_matches', 'reports'): ('reports', 'report_id', 'one'),
+    ('pictures', 'reports'): ('reports', 'report_id', 'one'),
+    ('comments', 'reports'): ('reports', 'report_id', 'one'),
+}
+
+
+class APIError(Exception):
+    def __init__(self, status, message, code='PGRST000'):
+        super().__init__(message)
+        self.status = status
+        self.body = {'message': message, 'code': code, 'details': None, 'hint': None}
+
+
+def now_iso(moment=None):
+    """Timestamps as PostgREST returns them; they sort as strings"""
+    return (moment or datetime.now(timezone.utc)).isoformat(timespec='microseconds')
+
+
+# --- Query parsing -----------------------------------------------------------
+
+def _split_top(text, sep=','):
+    """Split on sep outside of parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append(''.join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _unquote_value(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def parse_select(text):
+    """"*, pictures(storage_path)" -> (['*'], {'pictures': (['storage_path'], {})})"""
+    columns, embeds = [], {}
+    for item in _split_top(text or '*'):
+        if '(' in item and item.endswith(')'):
+            name, inner = item[:-1].split('(', 1)
+            name = name.split(':')[-1].split('!')[0].strip()
+            embeds[name] = parse_select(inner)
+        else:
+            columns.append(item.split('::')[0])
+    return columns, embeds
+
+
+def _parse_condition(column, expression):
+    """"not.eq.5" -> predicate on a row"""
+    negate = False
+    if expression.startswith('not.'):
+        negate, expression = True, expression[4:]
+    op, _, value = expression.partition('.')
+    check = _OPERATORS.get(op)
+    if check is None:
+        raise APIError(400, f'Unsupported operator: {op}', 'PGRST100')
+    if op == 'in':
+        value = [_unquote_value(v) for v in _split_top(value.strip('()'))]
+    elif op in ('like', 'ilike'):
+        pattern = re.escape(_unquote_value(value)).replace('%', '.*').replace(r'\*', '.*').replace('_', '.')
+        value = re.compile(f'^{pattern}$', (re.IGNORECASE if op == 'ilike' else 0) | re.DOTALL)
+    else:
+        value = _unquote_value(value)
+
+    def predicate(row):
+        result = check(row.get(column), value)
+        return not result if negate else result
+    return predicate
+
+
+def _parse_logic(text, combine):
+    """"(a.eq.1,and(b.lt.2,c.is.null))" -> predicate"""
+    predicates = []
+    for item in _split_top(text[1:-1]):
+        for name, inner_combine in (('and', all), ('or', any), ('not.and', None), ('not.or', None)):
+            if item.startswith(name + '('):
+                if inner_combine is None:
+                    inner = _parse_logic(item[len(name):], all if name == 'not.and' else any)
+                    predicates.append(lambda row, inner=inner: not inner(row))
+                else:
+                    predicates.append(_parse_logic(item[len(name):], inner_combine))
+                break
+        else:
+            column, _, expression = item.partition('.')
+            predicates.append(_parse_condition(column, expression))
+    return lambda row: combine(p(row) for p in predicates)
+
+
+def _coerce(stored, value):
+    """Compare a URL string with a stored value of whatever type"""
+    if stored is None:
+        return None
+    if isinstance(stored, bool):
+        return value.lower() == 'true'
+    if isinstance(stored, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return value
+
+
+def _compare(op):
+    def check(stored, value):
+        other = _coerce(stored, value)
+        if stored is None or other is None:
+            return False
+        if not isinstance(stored, (int, float, bool)):
+            stored = str(stored)
+        return op(stored, other)
+    return check
+
+
+def _is(stored, value):
+    return {'null': stored is None, 'true': stored is True, 'false': stored is False}.get(value.lower(), False)
+
+
+def _in(stored, values):
+    return stored is not None and any(_coerce(stored, v) == stored or str(stored) == v for v in values)
+
+
+def _like(stored, pattern):
+    return stored is not None and bool(pattern.match(str(stored)))
+
+
+_OPERATORS = {
+    'eq': _compare(lambda a, b: a == b),
+    'neq': _compare(lambda a, b: a != b),
+    'gt': _compare(lambda a, b: a > b),
+    'gte': _compare(lambda a, b: a >= b),
+    'lt': _compare(lambda a, b: a < b),
+    'lte': _compare(lambda a, b: a <= b),
+    'like': _like,
+    'ilike': _like,
+    'is': _is,
+    'in': _in,
+}
+
+_RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+def parse_query(query):
+    """Query string -> (params, [row predicates])"""
+    params, predicates = {}, []
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        if key in _RESERVED_PARAMS:
+            params[key] = value
+        elif key == 'or':
+            predicates.append(_parse_logic(value, any))
+        elif key == 'and':
+            predicates.append(_parse_logic(value, all))
+        elif '.' in key:
+            # Filters on embedded resources (pictures.variant=eq.x) are not used by the app
+            raise APIError(400, f'Unsupported embedded filter: {key}', 'PGRST100')
+        else:
+            predicates.append(_parse_condition(key, value))
+    return params, predicates
+
+
+def _sort(rows, order):
+    """PostgREST order: "created_at.desc,id.desc" (nulls last asc, first desc)"""
+    for item in reversed(_split_top(order)):
+        parts = item.split('.')
+        column, desc = parts[0], 'desc' in parts[1:]
+        nulls_first = 'nullsfirst' in parts[1:] or (desc and 'nullslast' not in parts[1:])
+        # Stable sorts from the last key to the first give the combined order
+        nulls = [r for r in rows if r.get(column) is None]
+        values = sorted((r for r in rows if r.get(column) is not None), key=lambda r: r[column], reverse=desc)
+        rows = nulls + values if nulls_first else values + nulls
+    return rows
+
+
+# --- In-memory store ----------------------------------------------------------
+
+class Store:
+    """Tables as lists of dicts, guarded by one lock"""
+
+    def __init__(self):
+        self.tables = defaultdict(list)
+        self.objects = {}  # storage "bucket/path" -> size in bytes
+        self.lock = threading.Lock()
+
+    def _project(self, table, rows, select):
+        columns, embeds = select
+        children = {}
+        for name in embeds:
+            target = EMBEDS.get((table, name))
+            if target is None:
+                raise APIError(400, f"Could not find a relationship between '{table}' and '{name}'", 'PGRST200')
+            embedded_table, key, kind = target
+            if kind == 'many':
+                grouped = defaultdict(list)
+                for child in self.tables[embedded_table]:
+                    grouped[child.get(key)].append(child)
+                children[name] = (embedded_table, key, kind, grouped)
+            else:
+                children[name] = (embedded_table, key, kind, {r['id']: r for r in self.tables[embedded_table]})
+
+        result = []
+        for row in rows:
+            if '*' in columns:
+                out = dict(row)
+            else:
+                out = {column: row.get(column) for column in columns}
+            for name, (embedded_table, key, kind, lookup) in children.items():
+                inner = embeds[name]
+                if kind == 'many':
+                    matches = lookup.get(row.get('id'), [])
+                    if inner[0] == ['count']:
+                        out[name] = [{'count': len(matches)}]
+                    else:
+                        out[name] = self._project(embedded_table, matches, inner)
+                else:
+                    parent = lookup.get(row.get(key))
+                    out[name] = self._project(embedded_table, [parent], inner)[0] if parent else None
+            result.append(out)
+        return result
+
+    def select(self, table, params, predicates, count=False):
+        with self.lock:
+            rows = [r for r in self.tables[table] if all(p(r) for p in predicates)]
+            total = len(rows)
+            if 'order' in params:
+                rows = _sort(rows, params['order'])
+            offset = int(params.get('offset') or 0)
+            rows = rows[offset:]
+            if params.get('limit'):
+                rows = rows[:int(params['limit'])]
+            return self._project(table, rows, parse_select(params.get('select'))), offset, total
+
+    def _with_defaults(self, table, row):
+        stamp = now_iso()
+        full = {'id': str(uuid.uuid4()), 'created_at': stamp, 'updated_at': stamp} if table not in NATURAL_KEYS else {}
+        full.update(DEFAULTS.get(table, {}))
+        full.update({k: (stamp if v == 'now()' else v) for k, v in row.items()})
+        return full
+
+    def _conflict(self, table, row, keys=None):
+        for unique in ([keys] if keys else UNIQUE.get(table, [])):
+            for existing in self.tables[table]:
+                if all(existing.get(k) == row.get(k) for k in unique):
+                    return existing
+        return None
+
+    def insert(self, table, rows, on_conflict=None, upsert=False):
+        with self.lock:
+            inserted = []
+            for row in rows:
+                full = self._with_defaults(table, row)
+                keys = tuple(on_conflict.split(',')) if on_conflict else None
+                existing = self._conflict(table, full, keys)
+                if existing is not None:
+                    if not upsert:
+                        raise APIError(409, f'duplicate key value violates unique constraint on {table}', '23505')
+                    existing.update({k: v for k, v in full.items() if k in row or k == 'updated_at'})
+                    inserted.append(existing)
+                else:
+                    self.tables[table].append(full)
+                    inserted.append(full)
+            return [dict(row) for row in inserted]
+
+    def update(self, table, changes, predicates):
+        stamp = now_iso()
+        changes = {k: (stamp if v == 'now()' else v) for k, v in changes.items()}
+        with self.lock:
+            updated = []
+            for row in self.tables[table]:
+                if all(p(row) for p in predicates):
+                    row.update(changes)
+                    if 'updated_at' in row and 'updated_at' not in changes:
+                        row['updated_at'] = stamp
+                    updated.append(row)
+            return [dict(row) for row in updated]
+
+    def delete(self, table, predicates):
+        with self.lock:
+            return self._delete(table, predicates)
+
+    def _delete(self, table, predicates):
+        kept, deleted = [], []
+        for row in self.tables[table]:
+            (deleted if all(p(row) for p in predicates) else kept).append(row)
+        self.tables[table] = kept
+        for child, key in CASCADE.get(table, []):
+            ids = {row['id'] for row in deleted}
+            if ids and self.tables[child]:
+                self._delete(child, [lambda r, key=key, ids=ids: r.get(key) in ids])
+        return deleted
+
+    def rpc(self, name, args):
+        with self.lock:
+            if name == 'report_stats':
+                counts = Counter(
+                    (r['created_at'][:10], r['status'], r['type']) for r in self.tables['reports']
+                )
+                return [{'day': d, 'status': s, 'type': t, 'count': c} for (d, s, t), c in counts.items()]
+            if name == 'set_permit_canonical':
+                links = {link['id']: link.get('canonical_id') for link in args.get('links') or []}
+                for row in self.tables['permits']:
+                    if row['id'] in links:
+                        row['canonical_id'] = links[row['id']] or None
+                return None
+        raise APIError(404, f'Could not find the function public.{name}', 'PGRST202')
+
+
+# --- Synthetic data -------------------------------------------------------------
+
+def seed(store, reports=5000, permits=20000, seed_value=1):
+    """Fill the store with reports (with pictures and comments), permits and a validator"""
+    import bcrypt
+
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    tables = store.tables
+    min_lat, min_lng, max_lat, max_lng = SECTOR1_BBOX
+
+    validator_id = str(uuid.uuid4())
+    tables['official_users'].append({
+        'id': validator_id,
+        'username': VALIDATOR_USERNAME,
+        'password_hash': bcrypt.hashpw(VALIDATOR_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8'),
+        'role': 'validator',
+        'created_at': now_iso(now - timedelta(days=400)),
+        'updated_at': now_iso(now - timedelta(days=400)),
+    })
+
+    for i in range(reports):
+        created = now_iso(now - timedelta(seconds=rng.randrange(365 * 86400)))
+        report_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        tables['reports'].append({
+            'id': report_id,
+            'type': rng.choice(REPORT_TYPES),
+            'status': rng.choices(REPORT_STATUSES, weights=[30, 10, 35, 10, 15])[0],
+            'location_lat': round(rng.uniform(min_lat, max_lat), 7),
+            'location_lng': round(rng.uniform(min_lng, max_lng), 7),
+            'address': f'{rng.choice(STREET_TYPES)} {rng.choice(STREETS)} {rng.randint(1, 200)}, Sector 1',
+            'description': 'Lucrari fara autorizatie afisata. ' * rng.randint(0, 5) or None,
+            'submitted_by_user_id': None,
+            'submitted_by_username': None,
+            'pictures_status': 'done',
+            'matched_at': None,
+            'created_at': created,
+            'updated_at': created,
+        })
+        for _ in range(rng.choice([0, 1, 1, 2, 3])):
+            group_id = str(uuid.uuid4())
+            for variant, width in (('original', 2560), ('medium', 1280), ('thumb', 400)):
+                path = f'{report_id}/{group_id}/{variant}.webp'
+                store.objects[f'report-pictures/{path}'] = width * 150
+                tables['pictures'].append({
+                    'id': str(uuid.uuid4()), 'report_id': report_id, 'storage_path': path,
+                    'variant': variant, 'group_id': group_id, 'width': width, 'height': width * 3 // 4,
+                    'created_at': created,
+                })
+        for _ in range(rng.choice([0, 0, 0, 1, 2])):
+            tables['comments'].append({
+                'id': str(uuid.uuid4()), 'report_id': report_id, 'user_id': validator_id,
+                'text': 'Verificat pe teren.', 'created_at': created,
+            })
+
+    for i in range(permits):
+        issuer = 'pmb' if i % 3 else 'ps1'
+        number = f'{rng.randint(1, 1500)}/{rng.randint(2015, 2025)}'
+        stamp = now_iso(now - timedelta(days=rng.randrange(3000)))
+        located = issuer == 'pmb' and rng.random() < 0.8
+        tables['permits'].append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            'issuer': issuer,
+            'natural_key': f'{issuer}:{i}',
+            'address': f'{rng.choice(STREET_TYPES)} {rng.choice(STREETS)} nr {rng.randint(1, 200)}, sector 1',
+            'lat': round(rng.uniform(min_lat, max_lat), 7) if located else None,
+            'lng': round(rng.uniform(min_lng, max_lng), 7) if located else None,
+            'data': {'Permit Number': number, 'Date': stamp[:10], 'Beneficiary': f'Beneficiar {i}'}
+            if issuer == 'pmb' else {'Nr. AC': number, 'Data emiterii': stamp[:10], 'Beneficiar': f'Beneficiar {i}'},
+            'source_url': 'https://example.org/permits',
+            'content_hash': None,
+            'canonical_id': None,
+            'created_at': stamp,
+            'updated_at': stamp,
+        })
+
+    for issuer in ('ps1', 'pmb'):
+        tables['permits_metadata'].append({
+            'issuer': issuer,
+            'total_count': sum(1 for p in tables['permits'] if p['issuer'] == issuer),
+            'last_scraped_at': now_iso(now), 'scraped_by_user_id': None, 'scraped_by_username': None,
+            'status': 'idle', 'error_message': None, 'last_added_count': 0, 'last_changed_count': 0,
+            'last_removed_count': 0, 'current_job_id': None, 'updated_at': now_iso(now),
+        })
+
+
+# --- HTTP ------------------------------------------------------------------------
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    store = None
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _json_body(self):
+        return json.loads(self.body) if self.body else None
+
+    def _send(self, status, body=None, headers=None):
+        if self.latency:
+            time.sleep(self.latency)
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        # Read every body, even of GETs (the client sends "{}"), to keep the connection usable
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else b''
+        try:
+            if path.startswith('/rest/v1/'):
+                self._rest(path[len('/rest/v1/'):], url.query)
+            elif path.startswith('/storage/v1/'):
+                self._storage(path[len('/storage/v1/'):])
+            else:
+                raise APIError(404, f'Not found: {path}')
+        except APIError as e:
+            self._send(e.status, e.body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'message': f'Bad request: {e}', 'code': 'PGRST100'})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = do_PUT = _dispatch
+
+    def _rest(self, target, query):
+        prefer = self.headers.get('Prefer', '')
+        returning = 'return=minimal' not in prefer
+
+        if target.startswith('rpc/'):
+            self._send(200, self.store.rpc(target[4:], self._json_body() or {}))
+            return
+
+        params, predicates = parse_query(query)
+        if self.command in ('GET', 'HEAD'):
+            rows, offset, total = self.store.select(target, params, predicates)
+            end = offset + len(rows) - 1
+            content_range = f"{offset}-{end}/{total if 'count=' in prefer else '*'}" if rows else f"*/{total}"
+            self._send(200, None if self.command == 'HEAD' else rows, {'Content-Range': content_range})
+        elif self.command == 'POST':
+            body = self._json_body()
+            rows = body if isinstance(body, list) else [body]
+            inserted = self.store.insert(target, rows, params.get('on_conflict'),
+                                         upsert='resolution=merge-duplicates' in prefer)
+            self._send(201, inserted if returning else None)
+        elif self.command == 'PATCH':
+            updated = self.store.update(target, self._json_body() or {}, predicates)
+            self._send(200, updated if returning else None)
+        elif self.command == 'DELETE':
+            deleted = self.store.delete(target, predicates)
+            self._send(200, deleted if returning else None)
+        else:
+            raise APIError(405, f'Method {self.command} not allowed')
+
+    def _storage(self, target):
+        parts = target.split('/')
+        if parts[0] != 'object' or len(parts) < 2:
+            raise APIError(404, f'Not found: /storage/v1/{target}')
+
+        if parts[1] == 'sign' and self.command == 'POST':
+            body = self._json_body() or {}
+            bucket = parts[2]
+            if len(parts) > 3:
+                path = '/'.join(parts[3:])
+                if f'{bucket}/{path}' not in self.store.objects:
+                    raise APIError(400, 'Object not found')
+                self._send(200, {'signedURL': f'/object/sign/{bucket}/{path}?token=loadtest'})
+            else:
+                self._send(200, [
+                    {'path': path, 'signedURL': f'/object/sign/{bucket}/{path}?token=loadtest', 'error': None}
+                    if f'{bucket}/{path}' in self.store.objects else
+                    {'path': path, 'signedURL': None, 'error': 'Either the object does not exist or you do not have access to it'}
+                    for path in body.get('paths', [])
+                ])
+        elif self.command in ('POST', 'PUT'):
+            key = '/'.join(parts[1:])
+            size = len(self.body)
+            with self.store.lock:
+                self.store.objects[key] = size
+            self._send(200, {'Key': key})
+        elif self.command == 'DELETE':
+            bucket = parts[1]
+            removed = []
+            with self.store.lock:
+                for path in (self._json_body() or {}).get('prefixes', []):
+                    if self.store.objects.pop(f'{bucket}/{path}', None) is not None:
+                        removed.append({'name': path, 'bucket_id': bucket})
+            self._send(200, removed)
+        else:
+            raise APIError(404, f'Not found: /storage/v1/{target}')
+
+
+class Server(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under load-test bursts
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start(store, port=54321, latency_ms=0, host='127.0.0.1'):
+    """Serve store in a background thread; returns the server (call .shutdown() to stop)"""
+    handler = type('StoreHandler', (Handler,), {'store': store, 'latency': latency_ms / 1000})
+    server = Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Supabase REST and Storage APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--reports', type=int, default=5000, help='synthetic reports to seed')
+    parser.add_argument('--permits', type=int, default=20000, help='synthetic permits to seed')
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay added to every response')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    store = Store()
+    seed(store, args.reports, args.permits, args.seed)
+    server = start(store, args.port, args.latency_ms, args.host)
+    print(f"[FAKE] Supabase stand-in on http://{args.host}:{args.port} "
+          f"({args.reports} reports, {args.permits} permits, {args.latency_ms:g} ms latency)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
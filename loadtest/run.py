@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+End-to-end load test of the app against the local Supabase stand-in.
+
+Starts loadtest/fake_supabase.py and the app (gunicorn, as in the
+Dockerfile, when it is installed) on local ports, then runs virtual users
+for a fixed duration. Each virtual user repeatedly picks a scenario by
+weight and runs it as a real browser would:
+
+    map        home page, map page, statistics, a few viewport (bbox) queries
+    report     a public report page
+    search     permits page, metadata, search-as-you-type, nearby permits
+    submit     report form, then a report with 1-3 photos
+    validator  log in once, dashboard, a report, change status or comment
+
+Latency is reported per route (p50/p95/p99/max) with throughput and error
+counts; with SERVER_TIMING on, the time and number of Supabase calls per
+route come from the app's Server-Timing header.
+
+    python loadtest/run.py --users 20 --duration 60
+    python loadtest/run.py --mix map=60,submit=20,search=20 --latency-ms 30
+    python loadtest/run.py --target http://127.0.0.1:5000   # app already running
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest.fake_supabase import (  # noqa: E402
+    FAKE_KEY, VALIDATOR_USERNAME, VALIDATOR_PASSWORD, SECTOR1_BBOX, STREETS
+)
+
+DEFAULT_MIX = 'map=45,report=20,search=20,submit=10,validator=5'
+
+# Samples of the first seconds (cold caches, index builds) are left out
+DEFAULT_WARMUP = 10
+
+_SERVER_TIMING_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) Supabase calls"')
+
+
+class Stats:
+    """Latency samples per route label, shared by all virtual users"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)  # label -> [(ms, db_ms, db_calls)]
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+        self.lock = threading.Lock()
+
+    def add(self, label, ms, status, db=None):
+        if not self.recording:
+            return
+        with self.lock:
+            self.samples[label].append((ms, *(db or (None, None))))
+            self.statuses[label][status] += 1
+            if status == 0 or status >= 400:
+                self.errors[label] += 1
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+class VirtualUser:
+    """One browser: its own session (cookies, keep-alive) and scenario loop"""
+
+    def __init__(self, base_url, stats, data, rng, think):
+        self.base_url = base_url
+        self.stats = stats
+        self.data = data
+        self.rng = rng
+        self.think = think
+        self.session = requests.Session()
+        self.logged_in = False
+
+    def request(self, label, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=120,
+                                            allow_redirects=False, **kwargs)
+            status = response.status_code
+            timing = _SERVER_TIMING_RE.search(response.headers.get('Server-Timing', ''))
+            db = (float(timing.group(1)), int(timing.group(2))) if timing else None
+        except requests.RequestException:
+            response, status, db = None, 0, None
+        self.stats.add(label, (time.perf_counter() - started) * 1000, status, db)
+        return response
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.uniform(0.5, 1.5) * self.think)
+
+    def report_id(self, public=False):
+        reports = self.data['public_reports'] if public else self.data['reports']
+        return self.rng.choice(reports)['id']
+
+    # --- Scenarios ---------------------------------------------------------------
+
+    def map(self):
+        self.request('GET /', 'GET', '/')
+        self.request('GET /reports', 'GET', '/reports')
+        self.request('GET /api/statistics', 'GET', '/api/statistics')
+        min_lat, min_lng, max_lat, max_lng = SECTOR1_BBOX
+        for _ in range(self.rng.randint(1, 4)):
+            zoom = self.rng.randint(13, 17)
+            span = 360.0 / 2 ** zoom * 4  # about a 1000 px wide viewport
+            lat = self.rng.uniform(min_lat, max_lat)
+            lng = self.rng.uniform(min_lng, max_lng)
+            bbox = f'{lng - span / 2},{lat - span / 4},{lng + span / 2},{lat + span / 4}'
+            self.request('GET /api/reports/map', 'GET', '/api/reports/map', params={'bbox': bbox, 'zoom': zoom})
+            self.pause()
+
+    def report(self):
+        self.request('GET /report/<id>', 'GET', f'/report/{self.report_id(public=True)}')
+
+    def search(self):
+        self.request('GET /permits', 'GET', '/permits')
+        self.request('GET /api/permits/metadata', 'GET', '/api/permits/metadata')
+        street = self.rng.choice(STREETS).split()[-1].lower()
+        # Search-as-you-type: the page queries again as the word grows
+        for length in range(3, len(street) + 1, 2):
+            self.request('GET /api/permits/search', 'GET', '/api/permits/search', params={'q': street[:length]})
+        min_lat, min_lng, max_lat, max_lng = SECTOR1_BBOX
+        self.request('GET /api/permits/near', 'GET', '/api/permits/near', params={
+            'lat': self.rng.uniform(min_lat, max_lat), 'lng': self.rng.uniform(min_lng, max_lng), 'radius': 300
+        })
+
+    def submit(self):
+        self.request('GET /report/new', 'GET', '/report/new')
+        self.pause()
+        min_lat, min_lng, max_lat, max_lng = SECTOR1_BBOX
+        photos = self.rng.sample(self.data['photos'], self.rng.randint(1, min(3, len(self.data['photos']))))
+        files = [('pictures', photo) for photo in photos]
+        self.request('POST /api/reports', 'POST', '/api/reports', files=files, data={
+            'type': self.rng.choice(['no-paperwork', 'noise-violation', 'pollution-violation', 'others']),
+            'lat': self.rng.uniform(min_lat, max_lat),
+            'lng': self.rng.uniform(min_lng, max_lng),
+            'address': f'Strada {self.rng.choice(STREETS)} {self.rng.randint(1, 200)}',
+            'description': 'Raport generat de testul de incarcare.'
+        })
+
+    def validator(self):
+        if not self.logged_in:
+            response = self.request('POST /login', 'POST', '/login', data={
+                'username': VALIDATOR_USERNAME, 'password': VALIDATOR_PASSWORD
+            })
+            self.logged_in = response is not None and response.status_code == 302
+            if not self.logged_in:
+                return
+        self.request('GET /validator', 'GET', '/validator')
+        self.request('GET /validator', 'GET', '/validator', params={'status': 'pending'})
+        report_id = self.report_id()
+        self.request('GET /validator/report/<id>', 'GET', f'/validator/report/{report_id}')
+        self.pause()
+        action = self.rng.random()
+        if action < 0.4:
+            self.request('POST /validator/report/<id>/status', 'POST', f'/validator/report/{report_id}/status',
+                         data={'status': self.rng.choice(['in-review', 'validated', 'resolved'])})
+        elif action < 0.6:
+            self.request('POST /validator/report/<id>/comment', 'POST', f'/validator/report/{report_id}/comment',
+                         data={'content': 'Verificat.'})
+
+    def run(self, mix, deadline):
+        names, weights = zip(*mix.items())
+        while time.monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+            self.pause()
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if not hasattr(VirtualUser, name) or name in ('request', 'pause', 'report_id', 'run'):
+            raise ValueError(f'unknown scenario {name!r}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _photos():
+    """(filename, bytes, content type) uploads: phone photos and a screenshot"""
+    from benchmarks import fixtures
+
+    images = fixtures.images()
+    return [
+        ('photo.jpg', images['jpeg-phone'], 'image/jpeg'),
+        ('photo-small.jpg', images['jpeg-small'], 'image/jpeg'),
+        ('photo.webp', images['webp-small'], 'image/webp'),
+        ('screenshot.png', images['png-screenshot'], 'image/png'),
+    ]
+
+
+def _wait_for(url, process=None, timeout=120):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f'{url}: process exited with status {process.returncode}')
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.5)
+    raise RuntimeError(f'{url} did not come up within {timeout}s')
+
+
+def start_fake(args):
+    command = [sys.executable, os.path.join(ROOT, 'loadtest', 'fake_supabase.py'),
+               '--port', str(args.fake_port), '--reports', str(args.reports),
+               '--permits', str(args.permits), '--latency-ms', str(args.latency_ms), '--seed', str(args.seed)]
+    process = subprocess.Popen(command)
+    url = f'http://127.0.0.1:{args.fake_port}'
+    _wait_for(f'{url}/rest/v1/permits_metadata?select=issuer', process)
+    return process, url
+
+
+def start_app(args, supabase_url, cache_dir, log):
+    env = dict(
+        os.environ,
+        SUPABASE_URL=supabase_url,
+        SUPABASE_ANON_KEY=FAKE_KEY,
+        SUPABASE_SERVICE_KEY=FAKE_KEY,
+        SECRET_KEY='loadtest',
+        CACHE_DIR=cache_dir,
+        SERVER_TIMING='True',
+        DEBUG='False',
+    )
+    if importlib.util.find_spec('gunicorn'):
+        command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{args.app_port}',
+                   '--workers', str(args.workers), '--timeout', '60', 'app:create_app()']
+    else:
+        print('[LOAD] gunicorn is not installed: using the threaded Flask server, '
+              'results will not match production')
+        env.update(HOST='127.0.0.1', PORT=str(args.app_port))
+        command = [sys.executable, '-c', 'from app import create_app; from app.config import Config; '
+                   'create_app().run(host=Config.HOST, port=Config.PORT, threaded=True)']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{args.app_port}'
+    _wait_for(f'{url}/', process)
+    return process, url
+
+
+def load_data(base_url):
+    """Report ids from the public list, and the photos to upload"""
+    reports = requests.get(f'{base_url}/api/reports', timeout=120).json()
+    if not reports:
+        raise RuntimeError('No reports to browse: seed the stand-in with --reports')
+    public = [r for r in reports if r['status'] != 'pending'] or reports
+    return {'reports': reports, 'public_reports': public, 'photos': _photos()}
+
+
+def summarize(stats, elapsed):
+    rows = []
+    for label in sorted(stats.samples):
+        samples = stats.samples[label]
+        latencies = sorted(s[0] for s in samples)
+        db = [s for s in samples if s[1] is not None]
+        rows.append({
+            'route': label,
+            'requests': len(samples),
+            'errors': stats.errors[label],
+            'statuses': dict(stats.statuses[label]),
+            'rps': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'max_ms': round(latencies[-1], 1),
+            'db_ms': round(sum(s[1] for s in db) / len(db), 1) if db else None,
+            'db_calls': round(sum(s[2] for s in db) / len(db), 1) if db else None,
+        })
+    return rows
+
+
+def print_report(rows, elapsed, args):
+    print(f"\n{args.users} users, {elapsed:.0f}s measured, mix {args.mix}, "
+          f"{args.latency_ms:g} ms Supabase latency\n")
+    print(f"{'route':<38}{'reqs':>7}{'err':>6}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+          f"{'db ms':>8}{'calls':>7}")
+    for row in rows:
+        db_ms = f"{row['db_ms']:.1f}" if row['db_ms'] is not None else '-'
+        db_calls = f"{row['db_calls']:.1f}" if row['db_calls'] is not None else '-'
+        print(f"{row['route']:<38}{row['requests']:>7}{row['errors']:>6}{row['rps']:>8.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+              f"{db_ms:>8}{db_calls:>7}")
+    total = sum(row['requests'] for row in rows)
+    errors = sum(row['errors'] for row in rows)
+    print(f"\n{total} requests, {total / elapsed:.1f} req/s, {errors} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=DEFAULT_WARMUP, help='unmeasured seconds first')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--think-ms', type=float, default=0,
+                        help='average pause between steps; 0 sends requests back to back')
+    parser.add_argument('--target', help='URL of an already running app (nothing is started)')
+    parser.add_argument('--supabase-url', help='URL of an already running stand-in')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--app-port', type=int, default=5055)
+    parser.add_argument('--fake-port', type=int, default=54321)
+    parser.add_argument('--reports', type=int, default=5000, help='reports seeded in the stand-in')
+    parser.add_argument('--permits', type=int, default=20000, help='permits seeded in the stand-in')
+    parser.add_argument('--latency-ms', type=float, default=10, help='stand-in delay per Supabase call')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='FILE', help='also write the results as JSON')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    processes = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='raportare-load-') as cache_dir:
+            base_url = args.target
+            if not base_url:
+                supabase_url = args.supabase_url
+                if not supabase_url:
+                    fake, supabase_url = start_fake(args)
+                    processes.append(fake)
+                log_path = os.path.join(tempfile.gettempdir(), 'raportare-loadtest-app.log')
+                print(f'[LOAD] App output goes to {log_path}')
+                with open(log_path, 'w') as log:
+                    app, base_url = start_app(args, supabase_url, cache_dir, log)
+                processes.append(app)
+
+            data = load_data(base_url)
+            stats = Stats()
+            rng = random.Random(args.seed)
+            started = time.monotonic()
+            deadline = started + args.warmup + args.duration
+            users = [
+                VirtualUser(base_url, stats, data, random.Random(rng.random()), args.think_ms / 1000)
+                for _ in range(args.users)
+            ]
+            threads = [threading.Thread(target=user.run, args=(mix, deadline), daemon=True) for user in users]
+            for thread in threads:
+                thread.start()
+
+            time.sleep(args.warmup)
+            stats.recording = True
+            measure_started = time.monotonic()
+            print(f'[LOAD] Warm-up done, measuring for {args.duration:g}s')
+            for thread in threads:
+                thread.join()
+            # In-flight requests finishing after the deadline still count
+            elapsed = time.monotonic() - measure_started
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    rows = summarize(stats, elapsed)
+    print_report(rows, elapsed, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'users': args.users, 'duration_s': round(elapsed, 1), 'mix': mix,
+                'latency_ms': args.latency_ms, 'routes': rows
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
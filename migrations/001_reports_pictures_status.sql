@@ -0,0 +1,3 @@
+-- Track background picture processing per report
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS pictures_status TEXT NOT NULL DEFAULT 'done'
+    CHECK (pictures_status IN ('processing', 'done', 'error'));
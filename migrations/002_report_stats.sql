@@ -0,0 +1,9 @@
+-- Aggregated report counts for the statistics page and validator dashboard
+CREATE OR REPLACE FUNCTION report_stats()
+RETURNS TABLE (day TEXT, status TEXT, type TEXT, count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD') AS day, status, type, COUNT(*) AS count
+    FROM reports
+    GROUP BY 1, 2, 3
+$$;
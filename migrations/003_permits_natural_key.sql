@@ -0,0 +1,9 @@
+-- Differential permit refresh: stable key + content hash per permit
+ALTER TABLE permits ADD COLUMN IF NOT EXISTS natural_key TEXT;
+ALTER TABLE permits ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_permits_issuer_natural_key ON permits(issuer, natural_key);
+
+-- Per-run change counts
+ALTER TABLE permits_metadata ADD COLUMN IF NOT EXISTS last_added_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE permits_metadata ADD COLUMN IF NOT EXISTS last_changed_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE permits_metadata ADD COLUMN IF NOT EXISTS last_removed_count INTEGER NOT NULL DEFAULT 0;
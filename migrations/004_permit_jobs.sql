@@ -0,0 +1,27 @@
+-- Background permit refresh jobs and their progress
+CREATE TABLE IF NOT EXISTS permit_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    issuer TEXT NOT NULL,  -- 'ps1' or 'pmb'
+    status TEXT NOT NULL DEFAULT 'queued',  -- 'queued', 'running', 'done', 'error'
+    phase TEXT,            -- 'queued', 'scraping', 'writing', 'deduplicating', 'indexing', 'matching', 'done', 'error'
+    items_done INTEGER NOT NULL DEFAULT 0,   -- PMB pages / PS1 files processed
+    items_total INTEGER NOT NULL DEFAULT 0,
+    permits_scraped INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    elapsed_seconds NUMERIC NOT NULL DEFAULT 0,
+    message TEXT,
+    error_message TEXT,
+    started_by_username TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_permit_jobs_issuer ON permit_jobs(issuer);
+
+ALTER TABLE permit_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can do everything on permit_jobs" ON permit_jobs
+    FOR ALL USING (auth.role() = 'service_role');
+
+ALTER TABLE permits_metadata ADD COLUMN IF NOT EXISTS current_job_id UUID REFERENCES permit_jobs(id) ON DELETE SET NULL;
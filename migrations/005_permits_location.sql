@@ -0,0 +1,4 @@
+-- WGS84 location of permits (converted from Stereo70 at scrape time)
+ALTER TABLE permits ADD COLUMN IF NOT EXISTS lat NUMERIC;
+ALTER TABLE permits ADD COLUMN IF NOT EXISTS lng NUMERIC;
+CREATE INDEX IF NOT EXISTS idx_permits_lat_lng ON permits(lat, lng) WHERE lat IS NOT NULL;
@@ -0,0 +1,5 @@
+-- Composite indexes for keyset pagination (newest first on created_at, id)
+CREATE INDEX IF NOT EXISTS idx_reports_created_at_id ON reports(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_status_created_at_id ON reports(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_contact_messages_created_at_id ON contact_messages(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_official_users_created_at_id ON official_users(created_at DESC, id DESC);
@@ -0,0 +1,9 @@
+-- Resized variants of each uploaded picture, one row per variant.
+-- Rows of the same upload share group_id; older single-file uploads keep
+-- variant 'original' and no group.
+ALTER TABLE pictures ADD COLUMN IF NOT EXISTS variant TEXT NOT NULL DEFAULT 'original'
+    CHECK (variant IN ('original', 'medium', 'thumb'));
+ALTER TABLE pictures ADD COLUMN IF NOT EXISTS group_id UUID;
+ALTER TABLE pictures ADD COLUMN IF NOT EXISTS width INTEGER;
+ALTER TABLE pictures ADD COLUMN IF NOT EXISTS height INTEGER;
+CREATE INDEX IF NOT EXISTS idx_pictures_group_id ON pictures(group_id);
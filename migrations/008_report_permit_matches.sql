@@ -0,0 +1,21 @@
+-- Best permit matches of each no-paperwork report (see app/matching.py)
+CREATE TABLE IF NOT EXISTS report_permit_matches (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    report_id UUID NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    permit_id UUID NOT NULL REFERENCES permits(id) ON DELETE CASCADE,
+    score NUMERIC NOT NULL,        -- 0..1, street/number/distance agreement
+    distance_m NUMERIC,            -- when both have coordinates
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (report_id, permit_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_report_permit_matches_permit_id ON report_permit_matches(permit_id);
+
+ALTER TABLE report_permit_matches ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can do everything on report_permit_matches" ON report_permit_matches
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- Set once a report has been matched; NULL reports are picked up by the incremental run
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS matched_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_reports_unmatched ON reports(type) WHERE matched_at IS NULL;
@@ -0,0 +1,17 @@
+-- Cross-source duplicates: a PS1/PMB record published by both points at its
+-- canonical permit; canonical permits keep NULL (see app/dedup.py)
+ALTER TABLE permits ADD COLUMN IF NOT EXISTS canonical_id UUID REFERENCES permits(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS idx_permits_canonical_id ON permits(canonical_id);
+
+-- Bulk update of canonical ids: links is [{"id": ..., "canonical_id": ...}, ...]
+CREATE OR REPLACE FUNCTION set_permit_canonical(links JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE permits p
+    SET canonical_id = NULLIF(l->>'canonical_id', '')::uuid
+    FROM jsonb_array_elements(links) l
+    WHERE p.id = (l->>'id')::uuid
+$$;
+
+REVOKE EXECUTE ON FUNCTION set_permit_canonical(JSONB) FROM PUBLIC, anon, authenticated;
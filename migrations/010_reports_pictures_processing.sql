@@ -0,0 +1,3 @@
+-- Reports still waiting for their pictures; lets recover_stuck_pictures()
+-- find ones whose batch was lost without scanning the table
+CREATE INDEX IF NOT EXISTS idx_reports_pictures_processing ON reports(created_at) WHERE pictures_status = 'processing';
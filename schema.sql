@@ -9,6 +9,8 @@ CREATE TABLE IF NOT EXISTS reports (
     status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'in-review', 'validated', 'invalidated', 'resolved', 'not-allowed')),
     submitted_by_user_id UUID,
     submitted_by_username TEXT,
+    pictures_status TEXT NOT NULL DEFAULT 'done' CHECK (pictures_status IN ('processing', 'done', 'error')),
+    matched_at TIMESTAMPTZ,  -- last permit matching run for this report
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -18,6 +20,10 @@ CREATE TABLE IF NOT EXISTS pictures (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     report_id UUID NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
     storage_path TEXT NOT NULL,
+    variant TEXT NOT NULL DEFAULT 'original' CHECK (variant IN ('original', 'medium', 'thumb')),
+    group_id UUID,  -- shared by the variants of one upload
+    width INTEGER,
+    height INTEGER,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
@@ -66,12 +72,47 @@ CREATE TABLE IF NOT EXISTS permits (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     issuer TEXT NOT NULL,  -- 'ps1' or 'pmb'
     address TEXT NOT NULL,
+    lat NUMERIC,           -- WGS84, when the source has coordinates (PMB)
+    lng NUMERIC,
     data JSONB NOT NULL,   -- all permit data as JSON
     source_url TEXT,
+    natural_key TEXT,      -- stable id across scrapes (PMB ID, PS1 file path + permit number)
+    content_hash TEXT,     -- sha256 of address/data/source_url/lat/lng, detects changes
+    canonical_id UUID REFERENCES permits(id) ON DELETE SET NULL,  -- set on cross-source duplicates
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Permit refresh jobs (background scraper runs and their progress)
+CREATE TABLE IF NOT EXISTS permit_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    issuer TEXT NOT NULL,  -- 'ps1' or 'pmb'
+    status TEXT NOT NULL DEFAULT 'queued',  -- 'queued', 'running', 'done', 'error'
+    phase TEXT,            -- 'queued', 'scraping', 'writing', 'deduplicating', 'indexing', 'matching', 'done', 'error'
+    items_done INTEGER NOT NULL DEFAULT 0,   -- PMB pages / PS1 files processed
+    items_total INTEGER NOT NULL DEFAULT 0,
+    permits_scraped INTEGER NOT NULL DEFAULT 0,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    elapsed_seconds NUMERIC NOT NULL DEFAULT 0,
+    message TEXT,
+    error_message TEXT,
+    started_by_username TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);
+
+-- Best permit matches of no-paperwork reports
+CREATE TABLE IF NOT EXISTS report_permit_matches (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    report_id UUID NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    permit_id UUID NOT NULL REFERENCES permits(id) ON DELETE CASCADE,
+    score NUMERIC NOT NULL,        -- 0..1, street/number/distance agreement
+    distance_m NUMERIC,            -- when both have coordinates
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (report_id, permit_id)
+);
+
 -- Permits metadata table (scraper status tracking)
 CREATE TABLE IF NOT EXISTS permits_metadata (
     issuer TEXT PRIMARY KEY,  -- 'ps1' or 'pmb'
@@ -81,6 +122,10 @@ CREATE TABLE IF NOT EXISTS permits_metadata (
     scraped_by_username TEXT,
     status TEXT DEFAULT 'idle',  -- 'idle', 'running', 'error'
     error_message TEXT,
+    last_added_count INTEGER NOT NULL DEFAULT 0,
+    last_changed_count INTEGER NOT NULL DEFAULT 0,
+    last_removed_count INTEGER NOT NULL DEFAULT 0,
+    current_job_id UUID REFERENCES permit_jobs(id) ON DELETE SET NULL,
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
@@ -88,11 +133,46 @@ CREATE TABLE IF NOT EXISTS permits_metadata (
 CREATE INDEX IF NOT EXISTS idx_reports_status ON reports(status);
 CREATE INDEX IF NOT EXISTS idx_reports_type ON reports(type);
 CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_created_at_id ON reports(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_status_created_at_id ON reports(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_contact_messages_created_at_id ON contact_messages(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_official_users_created_at_id ON official_users(created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_pictures_report_id ON pictures(report_id);
+CREATE INDEX IF NOT EXISTS idx_pictures_group_id ON pictures(group_id);
 CREATE INDEX IF NOT EXISTS idx_comments_report_id ON comments(report_id);
 CREATE INDEX IF NOT EXISTS idx_reports_history_report_id ON reports_history(report_id);
 CREATE INDEX IF NOT EXISTS idx_permits_issuer ON permits(issuer);
 CREATE INDEX IF NOT EXISTS idx_permits_address ON permits(address);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_permits_issuer_natural_key ON permits(issuer, natural_key);
+CREATE INDEX IF NOT EXISTS idx_permits_lat_lng ON permits(lat, lng) WHERE lat IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_permits_canonical_id ON permits(canonical_id);
+CREATE INDEX IF NOT EXISTS idx_permit_jobs_issuer ON permit_jobs(issuer);
+CREATE INDEX IF NOT EXISTS idx_report_permit_matches_permit_id ON report_permit_matches(permit_id);
+CREATE INDEX IF NOT EXISTS idx_reports_unmatched ON reports(type) WHERE matched_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_reports_pictures_processing ON reports(created_at) WHERE pictures_status = 'processing';
+
+-- Aggregated report counts (statistics page, validator dashboard)
+CREATE OR REPLACE FUNCTION report_stats()
+RETURNS TABLE (day TEXT, status TEXT, type TEXT, count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD') AS day, status, type, COUNT(*) AS count
+    FROM reports
+    GROUP BY 1, 2, 3
+$$;
+
+-- Bulk update of permit canonical ids (deduplication after refreshes)
+CREATE OR REPLACE FUNCTION set_permit_canonical(links JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE permits p
+    SET canonical_id = NULLIF(l->>'canonical_id', '')::uuid
+    FROM jsonb_array_elements(links) l
+    WHERE p.id = (l->>'id')::uuid
+$$;
+
+REVOKE EXECUTE ON FUNCTION set_permit_canonical(JSONB) FROM PUBLIC, anon, authenticated;
 
 -- Enable Row Level Security (RLS)
 ALTER TABLE reports ENABLE ROW LEVEL SECURITY;
@@ -103,6 +183,8 @@ ALTER TABLE reports_history ENABLE ROW LEVEL SECURITY;
 ALTER TABLE contact_messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE permits ENABLE ROW LEVEL SECURITY;
 ALTER TABLE permits_metadata ENABLE ROW LEVEL SECURITY;
+ALTER TABLE permit_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE report_permit_matches ENABLE ROW LEVEL SECURITY;
 
 -- RLS Policies for reports
 CREATE POLICY "Public can view all reports" ON reports
@@ -166,6 +248,14 @@ CREATE POLICY "Public can read permits_metadata" ON permits_metadata
 CREATE POLICY "Service role can do everything on permits_metadata" ON permits_metadata
     FOR ALL USING (auth.role() = 'service_role');
 
+-- RLS Policies for permit_jobs
+CREATE POLICY "Service role can do everything on permit_jobs" ON permit_jobs
+    FOR ALL USING (auth.role() = 'service_role');
+
+-- RLS Policies for report_permit_matches
+CREATE POLICY "Service role can do everything on report_permit_matches" ON report_permit_matches
+    FOR ALL USING (auth.role() = 'service_role');
+
 -- Initialize permits_metadata with default rows
 INSERT INTO permits_metadata (issuer, total_count, status) VALUES ('ps1', 0, 'idle') ON CONFLICT DO NOTHING;
 INSERT INTO permits_metadata (issuer, total_count, status) VALUES ('pmb', 0, 'idle') ON CONFLICT DO NOTHING;